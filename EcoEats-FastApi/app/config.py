@@ -10,6 +10,102 @@ class Settings(BaseSettings):
     FRONTEND_URL: str = "http://localhost:5173"
     ALLOW_ORIGINS: Optional[str] = None  # ✅ temporarily store as string first
 
+    # Outgoing email (outbox workers with pooled SMTP sessions)
+    SMTP_HOST: str = "smtp.gmail.com"
+    SMTP_PORT: int = 465
+    SMTP_USE_TLS: bool = True
+    SMTP_STARTTLS: bool = False
+    SMTP_LOGIN: bool = True
+    SMTP_TIMEOUT_SECONDS: int = 30
+    SMTP_IDLE_SECONDS: int = 120
+    EMAIL_WORKERS: int = 2
+    EMAIL_POLL_SECONDS: float = 2.0
+    EMAIL_SEND_LOCK_SECONDS: int = 120
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: int = 30
+    EMAIL_RETRY_MAX_SECONDS: int = 3600
+    EMAIL_SENT_RETENTION_SECONDS: int = 7 * 24 * 3600
+
+    # Daily expiry digest emails
+    DIGEST_HOUR_UTC: int = 7
+    DIGEST_DAYS_AHEAD: int = 3
+    DIGEST_MAX_ITEMS: int = 20
+    DIGEST_BATCH_SIZE: int = 500
+    DIGEST_MAX_SECONDS: int = 900
+
+    # Access tokens
+    ACCESS_TOKEN_MINUTES: int = 15
+    REFRESH_TOKEN_DAYS: int = 30
+    TOKEN_CACHE_SIZE: int = 10000
+    REVOCATION_SYNC_SECONDS: int = 5
+
+    # Auth rate limiting (per action, per minute)
+    RATE_LIMIT_IP_PER_MINUTE: int = 30
+    RATE_LIMIT_IDENTITY_PER_MINUTE: int = 5
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    RATE_LIMIT_SHARED: bool = False
+    # comma-separated IPs whose per-IP budget is skipped (load-test hosts only)
+    RATE_LIMIT_EXEMPT_IPS: str = ""
+
+    # User profile cache
+    PROFILE_CACHE_SIZE: int = 10000
+    PROFILE_CACHE_TTL_SECONDS: int = 30
+
+    # Analytics result cache: ranges reaching today vs. closed historical ranges
+    ANALYTICS_CACHE_SIZE: int = 2000
+    ANALYTICS_CACHE_LIVE_TTL_SECONDS: int = 30
+    ANALYTICS_CACHE_CLOSED_TTL_SECONDS: int = 900
+
+    # Analytics read routing (maxStalenessSeconds must be at least 90)
+    ANALYTICS_READ_SECONDARY: bool = True
+    ANALYTICS_MAX_STALENESS_SECONDS: int = 90
+    ANALYTICS_READ_CONCERN: str = "local"
+
+    # Approximate analytics: sample rollup rows once the collection is this large
+    ANALYTICS_APPROX_THRESHOLD: int = 1_000_000
+    ANALYTICS_SAMPLE_SIZE: int = 20_000
+
+    # Waste forecast (Holt linear smoothing over weekly rollup history)
+    FORECAST_HISTORY_WEEKS: int = 26
+    FORECAST_MAX_WEEKS: int = 12
+    FORECAST_ALPHA: float = 0.5
+    FORECAST_BETA: float = 0.3
+    FORECAST_CACHE_SIZE: int = 2000
+
+    # Parquet snapshots of food_items
+    EXPORT_DIR: str = "exports"
+    EXPORT_BATCH_ROWS: int = 10000
+    EXPORT_ADMIN_EMAILS: str = ""  # comma-separated; empty disables exports over HTTP
+    EXPORT_STALE_MINUTES: int = 30
+
+    # Verification codes are deleted this long after expires_at
+    VERIFICATION_CODE_RETENTION_SECONDS: int = 3600
+
+    # Password hashing (bcrypt runs on a bounded thread pool)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 32
+
+    # Background notification jobs (clear_all / mark_all_read)
+    NOTIFICATION_JOB_BATCH_SIZE: int = 500
+    NOTIFICATION_JOB_PAUSE_MS: int = 50
+
+    # Leader election for background listeners
+    LEASE_TTL_SECONDS: int = 15
+
+    # User event change stream
+    USER_EVENT_BATCH_SIZE: int = 100
+    USER_EVENT_MAX_AWAIT_MS: int = 500
+
+    # Meal reminder scheduler
+    MEAL_REMINDER_WINDOW_MINUTES: int = 5
+    MEAL_REMINDER_RECONCILE_MINUTES: int = 60
+    # leader's check of the reminder_state version (one _id read)
+    MEAL_REMINDER_POLL_SECONDS: int = 60
+
+    # Inventory ledger: how often passed expiry dates become expire events
+    LEDGER_SWEEP_MINUTES: int = 60
+
     model_config = SettingsConfigDict(env_file="app/.env")
 
     def get_allow_origins(self) -> List[str]:
@@ -1,5 +1,22 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
 from app.config import settings
 
 client = AsyncIOMotorClient(settings.MONGO_URI)
-db = client[settings.DB_NAME]
\ No newline at end of file
+
+# User-facing reads and all writes: primary
+db = client[settings.DB_NAME]
+
+# Analytics, exports and rollup rebuilds: secondaries when they are fresh enough,
+# so heavy aggregations stay off the inventory write path. Falls back to the
+# primary on a standalone mongod or when no secondary is within max staleness.
+analytics_db = client.get_database(
+    settings.DB_NAME,
+    read_preference=(
+        SecondaryPreferred(max_staleness=settings.ANALYTICS_MAX_STALENESS_SECONDS)
+        if settings.ANALYTICS_READ_SECONDARY
+        else Primary()
+    ),
+    read_concern=ReadConcern(settings.ANALYTICS_READ_CONCERN),
+)
@@ -0,0 +1,163 @@
+# app/exports.py
+"""
+Columnar snapshot of food_items for offline analysis.
+
+Streams the collection from a secondary (analytics_db) in created_at order and
+writes Parquet files partitioned by month:
+
+    <EXPORT_DIR>/<export_id>/month=2025-03/part-0.parquet
+
+Rows are buffered into record batches of EXPORT_BATCH_ROWS, so memory stays
+bounded by one batch whatever the collection size. Dates are normalized with
+analytics.as_utc and quantities with analytics.parse_quantity, matching what
+the analytics pipelines see.
+
+Usage:
+    python -m app.exports [--out-dir exports/manual] [--batch-rows 10000]
+"""
+import argparse
+import asyncio
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from app.database import analytics_db
+from app.config import settings
+from app.routers.analytics import as_utc, parse_quantity
+
+DATE_COLUMNS = ["created_at", "updated_at", "donated_at", "expiry_date"]
+
+FOOD_ITEM_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("user_id", pa.string()),
+    ("name", pa.string()),
+    ("category", pa.string()),
+    ("storage", pa.string()),
+    ("source", pa.string()),
+    ("quantity", pa.int64()),
+    ("created_at", pa.timestamp("ms")),
+    ("updated_at", pa.timestamp("ms")),
+    ("donated_at", pa.timestamp("ms")),
+    ("expiry_date", pa.timestamp("ms")),
+])
+
+PROJECTION = {name: 1 for name in FOOD_ITEM_SCHEMA.names if name != "id"}
+
+
+def month_of(row: dict) -> str:
+    created = row["created_at"]
+    return created.strftime("%Y-%m") if created else "unknown"
+
+
+def to_row(item: dict) -> dict:
+    row = {
+        "id": str(item["_id"]),
+        "user_id": str(item["user_id"]) if item.get("user_id") is not None else None,
+        "name": item.get("name"),
+        "category": item["category"] if item.get("category") is not None else "Unknown",
+        "storage": item.get("storage"),
+        "source": item.get("source"),
+        "quantity": parse_quantity(item.get("quantity")),
+    }
+    for column in DATE_COLUMNS:
+        row[column] = as_utc(item.get(column))
+    return row
+
+
+class PartitionedWriter:
+    """
+    Holds one open Parquet file at a time. The cursor is sorted by created_at,
+    so a month's rows arrive together; a month seen again (e.g. a leftover
+    string date) gets a new part file instead of overwriting the first one.
+    """
+
+    def __init__(self, out_dir: str, batch_rows: int):
+        self.out_dir = out_dir
+        self.batch_rows = batch_rows
+        self.month = None
+        self.writer = None
+        self.buffer = {name: [] for name in FOOD_ITEM_SCHEMA.names}
+        self.buffered = 0
+        self.parts = {}  # month -> number of part files written
+        self.rows = 0
+
+    def _open(self, month: str):
+        part = self.parts.get(month, 0)
+        self.parts[month] = part + 1
+        directory = os.path.join(self.out_dir, f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        self.writer = pq.ParquetWriter(
+            os.path.join(directory, f"part-{part}.parquet"), FOOD_ITEM_SCHEMA, compression="snappy"
+        )
+        self.month = month
+
+    def flush(self):
+        if not self.buffered:
+            return
+        batch = pa.RecordBatch.from_pydict(self.buffer, schema=FOOD_ITEM_SCHEMA)
+        self.writer.write_batch(batch)
+        self.rows += self.buffered
+        self.buffer = {name: [] for name in FOOD_ITEM_SCHEMA.names}
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def switch(self, month: str):
+        """Finish the current month's file and start `month`'s."""
+        self.close()
+        self._open(month)
+
+    def add(self, row: dict):
+        """
+        Buffer a row of the current month (switch() first when month_of(row)
+        differs); returns True when a full batch is ready to flush.
+        """
+        for name in FOOD_ITEM_SCHEMA.names:
+            self.buffer[name].append(row[name])
+        self.buffered += 1
+        return self.buffered >= self.batch_rows
+
+
+async def export_food_items(out_dir: str, batch_rows: int, on_progress=None) -> dict:
+    """
+    Write the snapshot and return a summary. `on_progress(rows)` is awaited
+    after each flushed batch so callers can record progress.
+    """
+    writer = PartitionedWriter(out_dir, batch_rows)
+    cursor = analytics_db.food_items.find({}, projection=PROJECTION).sort(
+        "created_at", 1
+    ).batch_size(batch_rows)
+
+    try:
+        async for item in cursor:
+            row = to_row(item)
+            month = month_of(row)
+            if month != writer.month:
+                # flushing and closing the finished file is Parquet I/O too
+                await asyncio.to_thread(writer.switch, month)
+            if writer.add(row):
+                # Parquet encoding and file I/O stay off the event loop
+                await asyncio.to_thread(writer.flush)
+                if on_progress:
+                    await on_progress(writer.rows)
+        await asyncio.to_thread(writer.close)
+    finally:
+        writer.close()
+
+    return {
+        "path": out_dir,
+        "rows": writer.rows,
+        "partitions": sorted(writer.parts),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export food_items to month-partitioned Parquet")
+    parser.add_argument("--out-dir", default=os.path.join(settings.EXPORT_DIR, "manual"))
+    parser.add_argument("--batch-rows", type=int, default=settings.EXPORT_BATCH_ROWS)
+    args = parser.parse_args()
+    result = asyncio.run(export_food_items(args.out_dir, args.batch_rows))
+    print(f"✅ Exported {result['rows']} item(s) into {len(result['partitions'])} month partition(s) at {result['path']}")
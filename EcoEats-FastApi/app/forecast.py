@@ -0,0 +1,40 @@
+# app/forecast.py
+"""
+Weekly waste forecasting.
+
+History arrives as (series, week, quantity) triples, where a series is one
+(category, outcome) pair. It is packed into a single (series x weeks) matrix
+and every series is smoothed together with Holt's linear method: the loop runs
+over weeks only, each step updating all series at once.
+"""
+import numpy as np
+
+OUTCOMES = ["saved", "donated", "wasted"]
+
+
+def weekly_matrix(series_index: np.ndarray, week_index: np.ndarray, quantity: np.ndarray,
+                  n_series: int, n_weeks: int) -> np.ndarray:
+    """Scatter-add the history triples into a dense (series, weeks) matrix."""
+    history = np.zeros((n_series, n_weeks), dtype=float)
+    np.add.at(history, (series_index, week_index), quantity)
+    return history
+
+
+def holt_forecast(history: np.ndarray, horizon: int, alpha: float, beta: float) -> np.ndarray:
+    """
+    Fit Holt's linear trend model to every row of `history` and project
+    `horizon` steps ahead. Returns a (series, horizon) matrix clipped at zero.
+    """
+    level = history[:, 0].copy()
+    if history.shape[1] > 1:
+        trend = history[:, 1] - history[:, 0]
+    else:
+        trend = np.zeros_like(level)
+
+    for t in range(1, history.shape[1]):
+        previous_level = level
+        level = alpha * history[:, t] + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous_level) + (1 - beta) * trend
+
+    steps = np.arange(1, horizon + 1, dtype=float)
+    return np.clip(level[:, None] + trend[:, None] * steps[None, :], 0, None)
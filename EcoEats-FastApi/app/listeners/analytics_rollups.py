@@ -0,0 +1,166 @@
+"""
+Daily analytics rollups.
+
+`daily_rollups` holds one row per (user, day, category, source, outcome) with
+the summed quantity and event count of the inventory ledger
+(app/listeners/inventory_ledger.py). Every recorded event is folded in with
+one upsert, and analytics endpoints read these rows instead of scanning raw
+collections.
+
+Rebuild from the ledger (or repair drift) with:
+    python -m app.listeners.analytics_rollups rebuild
+"""
+import asyncio
+import sys
+from datetime import datetime
+from pymongo import UpdateOne
+from app.database import db, analytics_db
+
+daily_rollups = db["daily_rollups"]
+rollup_state = db["rollup_state"]
+
+ROLLUP_KEY = ["user_id", "day", "category", "source", "outcome"]
+
+# rollup_state watermark bumped whenever any row changes; per-user ones are
+# "rollups_version:<user_id>". Readers (e.g. the forecast cache) compare it
+# instead of scanning daily_rollups for the newest updated_at.
+ALL_USERS_VERSION = "rollups_version:*"
+# bumped by rebuild_rollups, which may change every user's rows
+REBUILD_VERSION = "rollups_version:rebuild"
+
+
+def version_id(user_id) -> str:
+    return f"rollups_version:{user_id}" if user_id is not None else ALL_USERS_VERSION
+
+# ledger event type -> analytics outcome
+OUTCOME_BY_EVENT = {
+    "consume": "used",
+    "donate": "donated",
+    "discard": "wasted",
+    "expire": "wasted",
+}
+
+
+# ----------------------------------------------------
+# INDEXES
+# ----------------------------------------------------
+async def ensure_rollup_indexes(collection=daily_rollups):
+    await collection.create_index(
+        [(field, 1) for field in ROLLUP_KEY],
+        unique=True,
+        name="unique_rollup_key",
+    )
+    # range reads from the analytics endpoints
+    await collection.create_index([("day", 1), ("category", 1)], name="rollup_day_category")
+
+
+# ----------------------------------------------------
+# EVENT -> ROLLUP ROW
+# ----------------------------------------------------
+def rollup_key(event: dict) -> dict:
+    outcome = OUTCOME_BY_EVENT[event["type"]]
+    ts = event["ts"]
+    return {
+        "user_id": event["meta"].get("user_id"),
+        "day": datetime(ts.year, ts.month, ts.day),
+        "category": event["meta"]["category"],
+        "source": "donation" if outcome == "donated" else "inventory",
+        "outcome": outcome,
+    }
+
+
+async def apply_events(events: list):
+    """Fold ledger events into their daily rows; negative quantities reverse earlier events."""
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            rollup_key(event),
+            {"$inc": {"quantity": event["quantity"], "items": 1 if event["quantity"] >= 0 else -1},
+             "$set": {"updated_at": now}},
+            upsert=True,
+        )
+        for event in events
+    ]
+    if ops:
+        await daily_rollups.bulk_write(ops, ordered=False)
+        await bump_versions({event["meta"].get("user_id") for event in events}, now)
+
+
+async def bump_versions(user_ids: set, now: datetime):
+    ids = {version_id(user_id) for user_id in user_ids if user_id is not None}
+    ids.add(ALL_USERS_VERSION)
+    await rollup_state.bulk_write(
+        [UpdateOne({"_id": _id}, {"$set": {"updated_at": now}}, upsert=True) for _id in sorted(ids)],
+        ordered=False,
+    )
+
+
+# ----------------------------------------------------
+# REBUILD: recompute every row from the ledger
+# ----------------------------------------------------
+def rebuild_pipeline(now: datetime, into: str) -> list:
+    outcome = {"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$type", event_type]}, "then": outcome}
+            for event_type, outcome in OUTCOME_BY_EVENT.items()
+        ],
+        "default": None,
+    }}
+    return [
+        {"$group": {
+            "_id": {
+                "user_id": "$meta.user_id",
+                "day": {"$dateTrunc": {"date": "$ts", "unit": "day"}},
+                "category": "$meta.category",
+                "outcome": outcome,
+            },
+            "quantity": {"$sum": "$quantity"},
+            "items": {"$sum": {"$cond": [{"$lt": ["$quantity", 0]}, -1, 1]}},
+        }},
+        {"$match": {"_id.outcome": {"$ne": None}}},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "day": "$_id.day",
+            "category": "$_id.category",
+            "source": {"$cond": [{"$eq": ["$_id.outcome", "donated"]}, "donation", "inventory"]},
+            "outcome": "$_id.outcome",
+            "quantity": 1,
+            "items": 1,
+            "updated_at": {"$literal": now},
+        }},
+        {"$out": into},
+    ]
+
+
+async def rebuild_rollups(source=analytics_db) -> int:
+    """
+    Recompute daily_rollups from inventory_events into a scratch collection
+    and swap it in. Events recorded while the rebuild runs are not carried
+    over, so run it while traffic is quiet.
+
+    `source` is the database the ledger is scanned from: a secondary by
+    default, which is fine for an on-demand rebuild. Callers that have just
+    written events (backfill, seed) pass `db` so the scan sees them instead of
+    racing replication.
+    """
+    now = datetime.utcnow()
+    scratch = f"{daily_rollups.name}_rebuild"
+    # $out always writes through the primary, whichever member runs the scan
+    await source.inventory_events.aggregate(
+        rebuild_pipeline(now, scratch), allowDiskUse=True
+    ).to_list(length=None)
+    await ensure_rollup_indexes(db[scratch])
+    await db[scratch].rename(daily_rollups.name, dropTarget=True)
+    await rollup_state.update_one(
+        {"_id": REBUILD_VERSION}, {"$set": {"updated_at": now}}, upsert=True
+    )
+    return await daily_rollups.count_documents({})
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.listeners.analytics_rollups rebuild")
+        sys.exit(1)
+    rows = asyncio.run(rebuild_rollups())
+    print(f"📊 Rebuilt daily_rollups: {rows} row(s)")
@@ -0,0 +1,265 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+import aiosmtplib
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.database import db
+from app.config import settings
+
+email_outbox = db["email_outbox"]
+
+# Local wake-up for workers in this process; other processes rely on polling
+_new_mail = asyncio.Event()
+
+# In-process counters exposed through /metrics/email
+_stats = {"sent": 0, "failed": 0, "retried": 0}
+
+
+# ----------------------------------------------------
+# INDEXES
+# ----------------------------------------------------
+async def ensure_email_outbox_indexes():
+    await email_outbox.create_index(
+        [("status", 1), ("next_attempt_at", 1)],
+        name="email_claim",
+    )
+    # oldest-pending lookup for /metrics/email
+    await email_outbox.create_index(
+        [("status", 1), ("created_at", 1)],
+        name="email_status_created",
+    )
+    # delivered emails are only kept for auditing; expire them
+    await email_outbox.create_index(
+        "sent_at",
+        expireAfterSeconds=settings.EMAIL_SENT_RETENTION_SECONDS,
+        name="email_sent_ttl",
+        partialFilterExpression={"status": "sent"},
+    )
+    # Lets batch producers (e.g. the expiry digest) enqueue idempotently
+    await email_outbox.create_index(
+        "dedupe_key",
+        unique=True,
+        name="unique_email_dedupe_key",
+        partialFilterExpression={"dedupe_key": {"$exists": True}},
+    )
+
+
+# ----------------------------------------------------
+# PRODUCER: handlers only enqueue
+# ----------------------------------------------------
+def build_email(to_email: str, subject: str, html_content: str, dedupe_key: str | None = None) -> dict:
+    now = datetime.utcnow()
+    doc = {
+        "to": to_email,
+        "subject": subject,
+        "html": html_content,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    }
+    if dedupe_key:
+        doc["dedupe_key"] = dedupe_key
+    return doc
+
+
+async def enqueue_email(to_email: str, subject: str, html_content: str):
+    """Store an email in the outbox; a worker sends it in the background."""
+    await email_outbox.insert_one(build_email(to_email, subject, html_content))
+    _new_mail.set()
+
+
+async def enqueue_emails(docs: list) -> int:
+    """
+    Store a batch of build_email() documents with one insert. Documents whose
+    dedupe_key is already queued are skipped, so re-running a producer is safe.
+    """
+    if not docs:
+        return 0
+    try:
+        result = await email_outbox.insert_many(docs, ordered=False)
+        inserted = len(result.inserted_ids)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+        inserted = e.details.get("nInserted", 0)
+    _new_mail.set()
+    return inserted
+
+
+# ----------------------------------------------------
+# SMTP: one persistent session per worker
+# ----------------------------------------------------
+class SMTPSession:
+    """Keeps one SMTP connection open across sends and reconnects when it drops."""
+
+    def __init__(self):
+        self.client = None
+        self.last_used = None
+
+    async def _connect(self):
+        self.client = aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            use_tls=settings.SMTP_USE_TLS,
+            start_tls=settings.SMTP_STARTTLS,
+            timeout=settings.SMTP_TIMEOUT_SECONDS,
+        )
+        await self.client.connect()
+        if settings.SMTP_LOGIN:
+            await self.client.login(settings.EMAIL_SENDER, settings.EMAIL_PASSWORD)
+
+    async def send(self, message):
+        if self.client is None or not self.client.is_connected:
+            await self._connect()
+        try:
+            await self.client.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # idle connection was dropped by the server; reconnect once
+            await self._connect()
+            await self.client.send_message(message)
+        self.last_used = datetime.utcnow()
+
+    async def close_if_idle(self, idle_seconds: int):
+        if self.last_used and datetime.utcnow() - self.last_used > timedelta(seconds=idle_seconds):
+            await self.close()
+
+    async def close(self):
+        if self.client is not None and self.client.is_connected:
+            try:
+                await self.client.quit()
+            except Exception:
+                pass
+        self.client = None
+        self.last_used = None
+
+
+def to_mime(doc: dict) -> MIMEMultipart:
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = doc["subject"]
+    msg["From"] = settings.EMAIL_SENDER
+    msg["To"] = doc["to"]
+    msg.attach(MIMEText(doc["html"], "html"))
+    return msg
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff with jitter, capped at EMAIL_RETRY_MAX_SECONDS."""
+    base = settings.EMAIL_RETRY_BASE_SECONDS * (2 ** max(0, attempts - 1))
+    seconds = min(base, settings.EMAIL_RETRY_MAX_SECONDS)
+    return timedelta(seconds=seconds * random.uniform(0.8, 1.2))
+
+
+# ----------------------------------------------------
+# CONSUMER
+# ----------------------------------------------------
+async def claim_next_email() -> dict | None:
+    """
+    Atomically take the next due email. A claim pushes next_attempt_at forward,
+    so an email whose worker died mid-send becomes claimable again later.
+    """
+    now = datetime.utcnow()
+    return await email_outbox.find_one_and_update(
+        {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": now}},
+        {
+            "$set": {
+                "status": "sending",
+                "next_attempt_at": now + timedelta(seconds=settings.EMAIL_SEND_LOCK_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("next_attempt_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def deliver(session: SMTPSession, doc: dict):
+    try:
+        await session.send(to_mime(doc))
+    except Exception as e:
+        await session.close()
+        if doc["attempts"] >= settings.EMAIL_MAX_ATTEMPTS:
+            _stats["failed"] += 1
+            print(f"❌ Email to {doc['to']} failed permanently:", e)
+            await email_outbox.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {"status": "failed", "last_error": str(e), "failed_at": datetime.utcnow()}}
+            )
+        else:
+            _stats["retried"] += 1
+            await email_outbox.update_one(
+                {"_id": doc["_id"]},
+                {"$set": {
+                    "status": "pending",
+                    "last_error": str(e),
+                    "next_attempt_at": datetime.utcnow() + retry_delay(doc["attempts"]),
+                }}
+            )
+        return
+
+    _stats["sent"] += 1
+    await email_outbox.update_one(
+        {"_id": doc["_id"]},
+        {"$set": {"status": "sent", "sent_at": datetime.utcnow()}, "$unset": {"html": ""}}
+    )
+
+
+async def email_worker(worker_id: int):
+    session = SMTPSession()
+    try:
+        while True:
+            try:
+                doc = await claim_next_email()
+            except Exception as e:
+                print(f"Email worker {worker_id} claim failed:", e)
+                await asyncio.sleep(settings.EMAIL_POLL_SECONDS)
+                continue
+
+            if doc:
+                await deliver(session, doc)
+                continue
+
+            # queue is empty: keep the session warm unless it has idled too long
+            await session.close_if_idle(settings.SMTP_IDLE_SECONDS)
+            try:
+                await asyncio.wait_for(_new_mail.wait(), timeout=settings.EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _new_mail.clear()
+    finally:
+        await session.close()
+
+
+async def start_email_workers():
+    """Run EMAIL_WORKERS workers, each holding one pooled SMTP session."""
+    await ensure_email_outbox_indexes()
+    await asyncio.gather(*(email_worker(i) for i in range(settings.EMAIL_WORKERS)))
+
+
+# ----------------------------------------------------
+# METRICS
+# ----------------------------------------------------
+async def email_queue_metrics() -> dict:
+    # one indexed count per status (status leads email_claim) instead of a
+    # $group over the whole outbox; sent emails are bounded by email_sent_ttl
+    statuses = ["pending", "sending", "sent", "failed"]
+    totals = await asyncio.gather(
+        *(email_outbox.count_documents({"status": status}) for status in statuses)
+    )
+    counts = dict(zip(statuses, totals))
+
+    oldest = await email_outbox.find_one(
+        {"status": "pending"}, projection={"created_at": 1}, sort=[("created_at", 1)]
+    )
+    oldest_age = (
+        (datetime.utcnow() - oldest["created_at"]).total_seconds() if oldest else 0.0
+    )
+
+    return {
+        "queue": counts,
+        "oldest_pending_seconds": round(oldest_age, 1),
+        "this_worker": dict(_stats),
+    }
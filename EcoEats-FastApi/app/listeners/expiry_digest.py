@@ -0,0 +1,221 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from html import escape
+from string import Template
+from bson import ObjectId
+from app.database import db
+from app.config import settings
+from app.listeners.email_outbox import build_email, enqueue_emails
+
+digest_runs = db["digest_runs"]
+
+# ----------------------------------------------------
+# TEMPLATES (compiled once at import)
+# ----------------------------------------------------
+DIGEST_TEMPLATE = Template("""
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background-color: #6EA124; color: white; padding: 20px; text-align: center; border-radius: 8px 8px 0 0; }
+        .content { background-color: #f9f9f9; padding: 30px; border-radius: 0 0 8px 8px; }
+        table { width: 100%; border-collapse: collapse; }
+        td { padding: 8px; border-bottom: 1px solid #e0e0e0; }
+        .footer { text-align: center; color: #666; font-size: 12px; margin-top: 20px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h2>Items expiring soon</h2>
+        </div>
+        <div class="content">
+            <p>Hi $full_name,</p>
+            <p>$item_count item(s) in your EcoEats inventory expire in the next $days_ahead days:</p>
+            <table>$rows</table>
+            $more
+            <p>Plan a meal or donate them before they go to waste.</p>
+        </div>
+        <div class="footer">
+            <p>You are receiving this because expiry digests are enabled on your profile.</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+ROW_TEMPLATE = Template("<tr><td>$name</td><td>$quantity</td><td>$expiry</td></tr>")
+
+
+def render_digest(user: dict, items: list, item_count: int) -> str:
+    rows = "".join(
+        ROW_TEMPLATE.substitute(
+            name=escape(str(item.get("name", "Item"))),
+            quantity=escape(str(item.get("quantity", ""))),
+            expiry=item["expiry_date"].strftime("%Y-%m-%d") if isinstance(item.get("expiry_date"), datetime) else "",
+        )
+        for item in items
+    )
+    hidden = item_count - len(items)
+    more = f"<p>…and {hidden} more.</p>" if hidden > 0 else ""
+    return DIGEST_TEMPLATE.substitute(
+        full_name=escape(user.get("full_name") or "there"),
+        item_count=item_count,
+        days_ahead=settings.DIGEST_DAYS_AHEAD,
+        rows=rows,
+        more=more,
+    )
+
+
+# ----------------------------------------------------
+# AGGREGATION: opted-in users first, then their expiring items
+# ----------------------------------------------------
+def opted_in_users(after_user=None):
+    """
+    Opted-in users in _id order, read through the partial digest_opt_in
+    index, so users without the digest are never touched.
+    """
+    query = {"expiry_digest_email": True}
+    if after_user is not None:
+        # resume a run that hit its time budget (older checkpoints stored the id as a string)
+        if isinstance(after_user, str) and ObjectId.is_valid(after_user):
+            after_user = ObjectId(after_user)
+        query["_id"] = {"$gt": after_user}
+    return db.household_users.find(
+        query, projection={"email": 1, "full_name": 1}
+    ).sort("_id", 1).batch_size(settings.DIGEST_BATCH_SIZE)
+
+
+def digest_pipeline(window_start: datetime, window_end: datetime, user_ids: list) -> list:
+    """Expiring items of one batch of users, grouped per user on user_expiry_date."""
+    # food_items.user_id is stored as a string; accept ObjectIds too
+    owners = [str(uid) for uid in user_ids] + list(user_ids)
+    return [
+        {"$match": {
+            "user_id": {"$in": owners},
+            "source": {"$ne": "donation"},
+            "expiry_date": {"$gte": window_start, "$lt": window_end},
+        }},
+        {"$group": {
+            "_id": "$user_id",
+            # soonest DIGEST_MAX_ITEMS per user, bounded inside the group
+            # instead of pushing every item and slicing afterwards (MongoDB 5.2+)
+            "items": {"$topN": {
+                "n": settings.DIGEST_MAX_ITEMS,
+                "sortBy": {"expiry_date": 1},
+                "output": {"name": "$name", "quantity": "$quantity", "expiry_date": "$expiry_date"},
+            }},
+            "item_count": {"$sum": 1},
+        }},
+    ]
+
+
+# ----------------------------------------------------
+# JOB
+# ----------------------------------------------------
+async def digest_emails(users: list, window_start: datetime, window_end: datetime, run_id: str) -> list:
+    by_id = {str(user["_id"]): user for user in users}
+    rows = await db.food_items.aggregate(
+        digest_pipeline(window_start, window_end, [user["_id"] for user in users]),
+        allowDiskUse=True,
+    ).to_list(length=None)
+
+    emails = []
+    for row in rows:
+        user = by_id.get(str(row["_id"]))
+        if user and user.get("email"):
+            emails.append(build_email(
+                user["email"],
+                "EcoEats - Items expiring soon",
+                render_digest(user, row["items"], row["item_count"]),
+                dedupe_key=f"expiry_digest:{run_id}:{user['_id']}",
+            ))
+    return emails
+
+
+async def run_expiry_digest(day: datetime) -> dict:
+    """
+    Build and enqueue one digest email per opted-in user for `day`. Progress is
+    checkpointed per batch of users, so a run that hits DIGEST_MAX_SECONDS
+    resumes from the last user on the next attempt, and dedupe keys stop
+    double sends.
+    """
+    run_id = day.strftime("%Y-%m-%d")
+    run = await digest_runs.find_one({"_id": run_id}) or {}
+    if run.get("status") == "done":
+        return run
+
+    window_start = day
+    window_end = day + timedelta(days=settings.DIGEST_DAYS_AHEAD + 1)
+    started = time.monotonic()
+    queued = run.get("queued", 0)
+    last_user = run.get("last_user_id")
+    status = "done"
+
+    users = []
+    async for user in opted_in_users(last_user):
+        users.append(user)
+        if len(users) < settings.DIGEST_BATCH_SIZE:
+            continue
+
+        queued += await enqueue_emails(await digest_emails(users, window_start, window_end, run_id))
+        last_user = users[-1]["_id"]
+        users = []
+        await digest_runs.update_one(
+            {"_id": run_id},
+            {"$set": {"status": "running", "queued": queued, "last_user_id": last_user,
+                      "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+        if time.monotonic() - started > settings.DIGEST_MAX_SECONDS:
+            status = "partial"
+            break
+
+    if users:
+        queued += await enqueue_emails(await digest_emails(users, window_start, window_end, run_id))
+        last_user = users[-1]["_id"]
+
+    result = {
+        "status": status,
+        "queued": queued,
+        "last_user_id": last_user,
+        "updated_at": datetime.utcnow(),
+    }
+    await digest_runs.update_one({"_id": run_id}, {"$set": result}, upsert=True)
+    print(f"📬 Expiry digest {run_id}: {status}, {queued} email(s) queued")
+    return result
+
+
+async def start_expiry_digest_scheduler():
+    """Run the digest once a day at DIGEST_HOUR_UTC; retry soon if a run was cut short."""
+    await db.food_items.create_index("expiry_date", name="expiry_date")
+    # per-batch $match: user_id $in + expiry window
+    await db.food_items.create_index([("user_id", 1), ("expiry_date", 1)], name="user_expiry_date")
+    # only opted-in users are indexed, so the user scan skips everyone else
+    await db.household_users.create_index(
+        [("expiry_digest_email", 1), ("_id", 1)],
+        name="digest_opt_in",
+        partialFilterExpression={"expiry_digest_email": True},
+    )
+
+    while True:
+        now = datetime.utcnow()
+        today = datetime(now.year, now.month, now.day)
+        run_at = today + timedelta(hours=settings.DIGEST_HOUR_UTC)
+
+        if now >= run_at:
+            try:
+                result = await run_expiry_digest(today)
+                if result.get("status") != "done":
+                    await asyncio.sleep(300)
+                    continue
+            except Exception as e:
+                print("Expiry digest failed:", e)
+                await asyncio.sleep(300)
+                continue
+            run_at += timedelta(days=1)
+
+        await asyncio.sleep(max(1.0, (run_at - datetime.utcnow()).total_seconds()))
@@ -0,0 +1,285 @@
+"""
+Inventory event ledger.
+
+An append-only time-series collection (`inventory_events`) of what actually
+happened to food: consumed, donated, discarded or expired. Handlers record an
+event at the moment of the action, and each event is rolled into
+daily_rollups in the same call, so analytics aggregate real outcomes instead
+of re-deriving them from mutable food_items documents.
+
+A leader-only sweep records "expire" events for items that pass their
+expiry date while still in inventory.
+
+Seed the ledger from existing items once, after deploying:
+    python -m app.listeners.inventory_ledger backfill
+"""
+import asyncio
+import sys
+from datetime import datetime
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+from app.database import db
+from app.config import settings
+from app.routers.analytics import as_utc, parse_quantity
+from app.listeners.analytics_rollups import (
+    apply_events,
+    rebuild_rollups,
+    rollup_state,
+)
+
+inventory_events = db["inventory_events"]
+SWEEP_STATE_ID = "expiry_sweep"
+BACKFILL_STATE_ID = "ledger_backfill"
+
+EVENT_TYPES = {"consume", "donate", "discard", "expire"}
+
+
+# ----------------------------------------------------
+# COLLECTION (time series, MongoDB 5.0+)
+# ----------------------------------------------------
+async def ensure_inventory_ledger():
+    try:
+        await db.create_collection(
+            inventory_events.name,
+            timeseries={"timeField": "ts", "metaField": "meta", "granularity": "hours"},
+        )
+    except CollectionInvalid:
+        pass  # already created
+    await inventory_events.create_index([("meta.user_id", 1), ("ts", 1)], name="events_user_ts")
+
+
+# ----------------------------------------------------
+# EVENTS
+# ----------------------------------------------------
+def already_donated(item: dict) -> bool:
+    """Donated items are accounted for; deleting them later is not a discard."""
+    return item.get("donated") is True or item.get("status") == "Donated"
+
+
+def build_event(event_type: str, item: dict, quantity: int | None = None, ts: datetime | None = None) -> dict:
+    """
+    One ledger entry for `item`. `quantity` defaults to the item's whole
+    quantity; a negative quantity reverses an earlier event (e.g. unmark-donated).
+    """
+    if event_type not in EVENT_TYPES:
+        raise ValueError(f"Unknown inventory event type: {event_type}")
+    return {
+        "ts": ts or datetime.utcnow(),
+        "meta": {
+            "user_id": item.get("user_id"),
+            "category": item["category"] if item.get("category") is not None else "Unknown",
+        },
+        "type": event_type,
+        "quantity": parse_quantity(item.get("quantity")) if quantity is None else quantity,
+        "item_id": item.get("_id"),
+        "name": item.get("name"),
+    }
+
+
+async def write_events(events: list):
+    """Append events to the ledger and fold them into daily_rollups."""
+    if not events:
+        return
+    await inventory_events.insert_many(events, ordered=False)
+    await apply_events(events)
+
+
+async def record_inventory_events(events: list):
+    """
+    write_events for request handlers: a failure is logged rather than failing
+    the request; rebuilding the rollups recomputes them from the ledger.
+    """
+    try:
+        await write_events(events)
+    except Exception as e:
+        print("Failed to record inventory events:", e)
+
+
+async def record_inventory_event(event_type: str, item: dict, quantity: int | None = None,
+                                 ts: datetime | None = None):
+    await record_inventory_events([build_event(event_type, item, quantity, ts)])
+
+
+async def expire_recorded(item: dict) -> bool:
+    """
+    True when the ledger already holds an expire event for `item`: the
+    backfill recorded everything below the sweep watermark and the sweep
+    everything after it. Until the backfill has run nothing is assumed
+    recorded.
+    """
+    expiry = as_utc(item.get("expiry_date"))
+    if expiry is None or expiry >= datetime.utcnow():
+        return False
+    states = {
+        doc["_id"]: doc
+        async for doc in rollup_state.find({"_id": {"$in": [SWEEP_STATE_ID, BACKFILL_STATE_ID]}})
+    }
+    backfill = states.get(BACKFILL_STATE_ID)
+    if not backfill or backfill.get("status", "done") != "done" or SWEEP_STATE_ID not in states:
+        return False
+    return expiry < states[SWEEP_STATE_ID]["swept_until"]
+
+
+async def record_outcome(event_type: str, item: dict, quantity: int | None = None,
+                         ts: datetime | None = None):
+    """
+    record_inventory_event for consume/donate. If the sweep already counted
+    the item as expired, the same quantity is taken back out of its expire
+    row (dated at the expiry) so the food is not reported both ways; a
+    negative quantity (undoing a donation) puts it back.
+    """
+    event = build_event(event_type, item, quantity, ts)
+    events = [event]
+    if await expire_recorded(item):
+        events.append(build_event(
+            "expire", item, quantity=-event["quantity"], ts=as_utc(item["expiry_date"])
+        ))
+    await record_inventory_events(events)
+
+
+async def record_removal(item: dict):
+    """
+    Account for an item deleted without being used: donated items are already
+    counted, expired ones count as expired (once), anything else is a discard.
+    """
+    if already_donated(item):
+        return
+
+    expiry = as_utc(item.get("expiry_date"))
+    if expiry is not None and expiry < datetime.utcnow():
+        if await expire_recorded(item):
+            return  # the sweep already recorded its expire event
+        # deleted before the sweep reached it
+        await record_inventory_events([build_event("expire", item, ts=expiry)])
+        return
+
+    await record_inventory_event("discard", item)
+
+
+# ----------------------------------------------------
+# EXPIRY SWEEP: items expire without any request
+# ----------------------------------------------------
+async def sweep_expired(now: datetime) -> int:
+    """
+    Record an expire event for each item whose expiry passed since the last
+    sweep. The first pass runs the backfill instead: it records everything
+    that expired before the watermark it sets, so the two never overlap.
+    """
+    backfill = await rollup_state.find_one({"_id": BACKFILL_STATE_ID})
+    if not backfill:
+        return await backfill_ledger(now)
+    # claims written before the status field existed are finished runs
+    if backfill.get("status", "done") != "done":
+        # running elsewhere (e.g. the CLI), or failed and waiting for an operator
+        print(f"Inventory expiry sweep waiting for the ledger backfill ({backfill.get('status')})")
+        return 0
+
+    state = await rollup_state.find_one({"_id": SWEEP_STATE_ID})
+
+    expired = 0
+    batch = []
+    cursor = db.food_items.find(
+        {"expiry_date": {"$gte": state["swept_until"], "$lt": now}},
+        projection={"user_id": 1, "category": 1, "quantity": 1, "name": 1,
+                    "expiry_date": 1, "donated": 1, "status": 1},
+    )
+    async for item in cursor:
+        if already_donated(item):
+            continue
+        batch.append(build_event("expire", item, ts=as_utc(item["expiry_date"])))
+        if len(batch) >= 500:
+            await write_events(batch)
+            expired += len(batch)
+            batch = []
+
+    # errors propagate so the watermark only moves once every event is written
+    await write_events(batch)
+    expired += len(batch)
+
+    await rollup_state.update_one(
+        {"_id": SWEEP_STATE_ID}, {"$set": {"swept_until": now}}, upsert=True
+    )
+    return expired
+
+
+async def start_expiry_sweeper():
+    """Leader-only loop that turns passed expiry dates into ledger events."""
+    while True:
+        try:
+            recorded = await sweep_expired(datetime.utcnow())
+            if recorded:
+                print(f"📒 Inventory ledger: {recorded} event(s) recorded")
+        except Exception as e:
+            print("Inventory expiry sweep failed:", e)
+        await asyncio.sleep(settings.LEDGER_SWEEP_MINUTES * 60)
+
+
+# ----------------------------------------------------
+# BACKFILL: seed the ledger from items that predate it
+# ----------------------------------------------------
+async def backfill_ledger(now: datetime, force: bool = False) -> int:
+    """
+    Infer events for items already in food_items: donated items get a donate
+    event, items that expired below the sweep watermark an expire event (the
+    sweep owns everything after it; with no watermark yet it starts at `now`).
+    Items consumed or deleted before the ledger existed left no trace and
+    cannot be recovered.
+
+    Runs once: the ledger_backfill state is claimed up front, so the sweeper
+    and the CLI cannot both run it. `force` re-runs it after the caller has
+    cleared the ledger (seed_data).
+    """
+    await ensure_inventory_ledger()
+    if force:
+        await rollup_state.delete_one({"_id": BACKFILL_STATE_ID})
+    try:
+        await rollup_state.insert_one({"_id": BACKFILL_STATE_ID, "ran_at": now, "status": "running"})
+    except DuplicateKeyError:
+        done = await rollup_state.find_one({"_id": BACKFILL_STATE_ID})
+        print("Ledger backfill already ran at", done["ran_at"])
+        return 0
+
+    try:
+        await rollup_state.update_one(
+            {"_id": SWEEP_STATE_ID}, {"$setOnInsert": {"swept_until": now}}, upsert=True
+        )
+        watermark = (await rollup_state.find_one({"_id": SWEEP_STATE_ID}))["swept_until"]
+
+        recorded = 0
+        batch = []
+        async for item in db.food_items.find({}):
+            if already_donated(item):
+                ts = as_utc(item.get("donated_at")) or as_utc(item.get("created_at")) or now
+                batch.append(build_event("donate", item, ts=ts))
+            else:
+                expiry = as_utc(item.get("expiry_date"))
+                if expiry is not None and expiry < watermark:
+                    batch.append(build_event("expire", item, ts=expiry))
+            if len(batch) >= 500:
+                await inventory_events.insert_many(batch, ordered=False)
+                recorded += len(batch)
+                batch = []
+
+        if batch:
+            await inventory_events.insert_many(batch, ordered=False)
+            recorded += len(batch)
+
+        await rollup_state.update_one(
+            {"_id": BACKFILL_STATE_ID}, {"$set": {"status": "done", "events": recorded}}
+        )
+    except Exception:
+        # events written so far stay in the ledger; clear them (or reseed)
+        # before re-running with force
+        await rollup_state.update_one({"_id": BACKFILL_STATE_ID}, {"$set": {"status": "failed"}})
+        raise
+
+    # read our own writes: a secondary may not have the events yet
+    await rebuild_rollups(source=db)
+    return recorded
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["backfill"]:
+        print("Usage: python -m app.listeners.inventory_ledger backfill")
+        sys.exit(1)
+    events = asyncio.run(backfill_ledger(datetime.utcnow()))
+    print(f"📒 Backfilled {events} inventory event(s)")
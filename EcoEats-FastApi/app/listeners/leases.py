@@ -0,0 +1,127 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.database import db
+from app.config import settings
+
+leases = db["leases"]
+
+# Unique per process so two workers on the same host never share a lease
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Lease names currently held by this process (released on shutdown)
+_held = set()
+
+
+# ----------------------------------------------------
+# INDEXES
+# ----------------------------------------------------
+async def ensure_lease_indexes():
+    # TTL only garbage-collects dead leases; ownership is decided by expires_at itself
+    await leases.create_index("expires_at", expireAfterSeconds=0, name="lease_ttl")
+
+
+# ----------------------------------------------------
+# ACQUIRE / RENEW / RELEASE
+# ----------------------------------------------------
+async def try_acquire_lease(name: str, ttl: timedelta) -> bool:
+    """
+    Take or renew the lease `name`. Succeeds when nobody holds it, when this
+    worker already holds it, or when the holder stopped heartbeating.
+    """
+    now = datetime.utcnow()
+    try:
+        doc = await leases.find_one_and_update(
+            {"_id": name, "$or": [{"owner": WORKER_ID}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": WORKER_ID, "expires_at": now + ttl, "heartbeat_at": now}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # another worker holds a live lease, so the upsert collided on _id
+        return False
+
+    return bool(doc) and doc.get("owner") == WORKER_ID
+
+
+async def release_lease(name: str):
+    _held.discard(name)
+    await leases.delete_one({"_id": name, "owner": WORKER_ID})
+
+
+async def release_all_leases():
+    """Hand every held lease back so another worker can take over immediately."""
+    for name in list(_held):
+        try:
+            await release_lease(name)
+        except Exception as e:
+            print(f"Failed to release lease {name}:", e)
+
+
+# ----------------------------------------------------
+# RUNNER: run a background job on exactly one worker
+# ----------------------------------------------------
+async def run_as_leader(name: str, job_factory):
+    """
+    Keep competing for lease `name`. While held, run `job_factory()` and renew
+    the lease every third of its TTL; if renewal stops succeeding before the
+    lease runs out, cancel the job so the next owner is the only one running it.
+    """
+    ttl = timedelta(seconds=settings.LEASE_TTL_SECONDS)
+    heartbeat = ttl.total_seconds() / 3
+
+    while True:
+        try:
+            acquired = await try_acquire_lease(name, ttl)
+        except Exception as e:
+            print(f"Lease {name} acquire failed:", e)
+            acquired = False
+
+        if not acquired:
+            await asyncio.sleep(heartbeat)
+            continue
+
+        print(f"👑 {WORKER_ID} now runs {name}")
+        _held.add(name)
+        renewed_at = datetime.utcnow()
+        task = asyncio.create_task(job_factory())
+
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=heartbeat)
+                if task.done():
+                    break
+
+                try:
+                    if await try_acquire_lease(name, ttl):
+                        renewed_at = datetime.utcnow()
+                        continue
+                    print(f"Lease {name} taken over by another worker")
+                    break
+                except Exception as e:
+                    print(f"Lease {name} renewal failed:", e)
+                    # keep running only while the last successful renewal still covers us
+                    if datetime.utcnow() - renewed_at < ttl - timedelta(seconds=heartbeat):
+                        continue
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+        if not task.cancelled() and task.exception():
+            print(f"Background job {name} crashed:", task.exception())
+
+        try:
+            await release_lease(name)
+        except Exception:
+            _held.discard(name)
+
+        await asyncio.sleep(heartbeat)
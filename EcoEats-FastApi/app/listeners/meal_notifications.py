@@ -1,6 +1,10 @@
 import asyncio
+import heapq
 from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from app.database import db
+from app.config import settings
 
 # ----------------------------------------------------
 # CREATE UNIQUE INDEXES (run on startup)
@@ -48,6 +52,316 @@ async def ensure_unique_indexes():
         }
     )
 
+    # Window loads of the reminder scheduler only touch not-yet-sent reminders
+    await db.notifications.create_index(
+        [("send_at", 1)],
+        name="scheduled_send_at",
+        partialFilterExpression={"status": "scheduled"},
+    )
+
+    # Plain lookup index for cascade deletes and the orphan reconciliation
+    await db.notifications.create_index(
+        [("meal_entry_id", 1)],
+        name="meal_entry_lookup",
+        sparse=True,
+    )
+
+
+# ----------------------------------------------------
+# HELPER: compute the reminders a meal entry needs
+# ----------------------------------------------------
+REMINDER_OFFSETS = [
+    (timedelta(days=1), "1 day before"),
+    (timedelta(hours=1), "1 hour before"),
+]
+
+# Only the fields needed to build reminders are pulled from meal_entries
+ENTRY_PROJECTION = {
+    "user_id": 1,
+    "slot": 1,
+    "day": 1,
+    "date": 1,
+    "meal.name": 1,
+    "meal.time": 1,
+}
+
+
+def build_meal_reminders(entry: dict, now: datetime) -> list:
+    """Return the reminder notification documents still due for one meal entry."""
+    meal = entry.get("meal")
+    if not meal:
+        return []
+
+    try:
+        meal_date = datetime.fromisoformat(entry.get("date"))
+    except Exception:
+        return []
+
+    meal_time = meal.get("time") or "12:00"
+    try:
+        hour, minute = map(int, meal_time.split(":"))
+    except Exception:
+        hour, minute = 12, 0
+
+    meal_datetime = meal_date.replace(hour=hour, minute=minute)
+    slot = entry.get("slot") or ""
+    day = entry.get("day")
+
+    docs = []
+    for offset, label in REMINDER_OFFSETS:
+        send_at = meal_datetime - offset
+        if send_at <= now:
+            continue
+
+        docs.append({
+            "user_id": entry.get("user_id"),
+            "type": "meal_reminder",
+            "title": f"Meal reminder: {meal.get('name')}",
+            "message": f"{slot.title()} on {day} ({label})",
+            "created_at": now,
+            "send_at": send_at,
+            "meal_entry_id": entry["_id"],
+            "notif_label": label,
+            "is_read": False,
+            "show_action": False,
+            "status": "scheduled"
+        })
+    return docs
+
+
+async def upsert_meal_reminders(entries: list, now: datetime | None = None) -> int:
+    """
+    Build the reminders for `entries` in memory and upsert them in one unordered
+    bulk_write keyed on the unique_meal_reminder index. Existing reminders are
+    left untouched; new ones are handed to the scheduler.
+    """
+    now = now or datetime.utcnow()
+
+    docs = []
+    ops = []
+    for entry in entries:
+        for doc in build_meal_reminders(entry, now):
+            key = {
+                "meal_entry_id": doc["meal_entry_id"],
+                "notif_label": doc["notif_label"],
+                "user_id": doc["user_id"],
+                "type": "meal_reminder",
+            }
+            docs.append(doc)
+            ops.append(UpdateOne(key, {"$setOnInsert": doc}, upsert=True))
+
+    if not ops:
+        return 0
+
+    try:
+        result = await db.notifications.bulk_write(ops, ordered=False)
+        upserted = result.upserted_ids.items()
+    except BulkWriteError as e:
+        # duplicate-key races with another writer are expected and harmless
+        upserted = [(u["index"], u["_id"]) for u in e.details.get("upserted", [])]
+
+    count = 0
+    soon = False
+    horizon = now + reminder_scheduler.window
+    for index, notif_id in upserted:
+        reminder_scheduler.add(notif_id, docs[index]["send_at"])
+        soon = soon or docs[index]["send_at"] <= horizon
+        count += 1
+
+    if soon:
+        # may land inside the leader's loaded window, which only the leader's
+        # own add() reaches; later reminders are picked up by the next window load
+        await bump_reminder_version()
+    return count
+
+
+# ----------------------------------------------------
+# CROSS-WORKER SIGNAL: reminders written inside the loaded window
+# ----------------------------------------------------
+REMINDER_STATE_ID = "scheduled_reminders"
+
+
+async def bump_reminder_version():
+    await db.reminder_state.update_one(
+        {"_id": REMINDER_STATE_ID}, {"$inc": {"version": 1}}, upsert=True
+    )
+
+
+async def reminder_version() -> int:
+    doc = await db.reminder_state.find_one({"_id": REMINDER_STATE_ID})
+    return doc["version"] if doc else 0
+
+
+async def generate_meal_reminders(now: datetime) -> int:
+    """
+    Catch-up pass: read future meal entries with a single projected query and
+    upsert whatever reminders are missing. Runs once at listener start; after
+    that the meal plan write paths call upsert_meal_reminders directly.
+    """
+    entries = await db.meal_entries.find(
+        {"date": {"$gte": now.strftime("%Y-%m-%d")}},
+        projection=ENTRY_PROJECTION
+    ).to_list(length=None)
+    return await upsert_meal_reminders(entries, now)
+
+
+# ----------------------------------------------------
+# SCHEDULER: activate reminders exactly when send_at is reached
+# ----------------------------------------------------
+class ReminderScheduler:
+    """
+    In-process timer for scheduled reminders. A heap keyed by send_at holds the
+    reminders due inside the current window (loaded with one indexed send_at
+    query); the loop sleeps until the next deadline, flips due reminders to
+    "sent" and only goes back to the database when the window runs out.
+    """
+
+    def __init__(self, window: timedelta):
+        self.window = window
+        self._heap = []
+        self._queued = set()
+        self._loaded_until = None
+        self._seen_version = None
+        self._wakeup = asyncio.Event()
+
+    def add(self, notif_id, send_at: datetime):
+        """
+        Queue a freshly written reminder if it falls inside the loaded window.
+        Only the leader has a window; reminders written on other workers reach
+        it through refresh_if_changed.
+        """
+        if self._loaded_until is None or send_at > self._loaded_until:
+            return  # picked up by the window load that covers it
+        self._push(notif_id, send_at)
+        self._wakeup.set()
+
+    def _push(self, notif_id, send_at: datetime):
+        if notif_id in self._queued:
+            return
+        self._queued.add(notif_id)
+        heapq.heappush(self._heap, (send_at, notif_id))
+
+    def window_expired(self, now: datetime) -> bool:
+        return self._loaded_until is None or now >= self._loaded_until
+
+    async def load_window(self, now: datetime):
+        until = now + self.window
+        # read the version first so a bump racing this load is not lost
+        self._seen_version = await reminder_version()
+        cursor = db.notifications.find(
+            {"status": "scheduled", "send_at": {"$lte": until}},
+            projection={"send_at": 1},
+        ).sort("send_at", 1)
+        async for doc in cursor:
+            self._push(doc["_id"], doc["send_at"])
+        self._loaded_until = until
+
+    async def refresh_if_changed(self):
+        """
+        Re-read the loaded window only when another worker has written a
+        reminder inside it (reminder_state version moved); otherwise this is a
+        single _id lookup. Already-queued reminders are skipped.
+        """
+        if self._loaded_until is None:
+            return
+        version = await reminder_version()
+        if version == self._seen_version:
+            return
+        self._seen_version = version
+        cursor = db.notifications.find(
+            {"status": "scheduled", "send_at": {"$lte": self._loaded_until}},
+            projection={"send_at": 1},
+        )
+        async for doc in cursor:
+            self._push(doc["_id"], doc["send_at"])
+
+    async def activate_due(self, now: datetime) -> int:
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            _, notif_id = heapq.heappop(self._heap)
+            self._queued.discard(notif_id)
+            due_ids.append(notif_id)
+
+        if not due_ids:
+            return 0
+
+        result = await db.notifications.update_many(
+            {"_id": {"$in": due_ids}, "status": "scheduled"},
+            {"$set": {"status": "sent", "sent_at": now, "created_at": now}}
+        )
+        return result.modified_count
+
+    def next_deadline(self) -> datetime:
+        if self._heap:
+            return min(self._heap[0][0], self._loaded_until)
+        return self._loaded_until
+
+    async def sleep_until(self, deadline: datetime):
+        timeout = max(0.0, (deadline - datetime.utcnow()).total_seconds())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+
+reminder_scheduler = ReminderScheduler(
+    window=timedelta(minutes=settings.MEAL_REMINDER_WINDOW_MINUTES)
+)
+
+
+# ----------------------------------------------------
+# CASCADE: delete meal entries together with their notifications
+# ----------------------------------------------------
+async def delete_meal_entries(query: dict) -> int:
+    """
+    Delete the meal entries matching `query` and every notification tied to
+    them (reminders and meal activity) with one `$in` delete.
+    """
+    entry_ids = await db.meal_entries.distinct("_id", query)
+    if not entry_ids:
+        return 0
+
+    result = await db.meal_entries.delete_many({"_id": {"$in": entry_ids}})
+    await db.notifications.delete_many({"meal_entry_id": {"$in": entry_ids}})
+    return result.deleted_count
+
+
+# ----------------------------------------------------
+# RECONCILIATION: catch orphans the cascade missed
+# ----------------------------------------------------
+async def reconcile_orphan_meal_notifications(batch_size: int = 500) -> int:
+    """
+    Anti-join notifications against meal_entries on the server ($lookup on the
+    indexed _id) and delete the ones whose meal entry no longer exists.
+    """
+    pipeline = [
+        {"$match": {"meal_entry_id": {"$exists": True}}},
+        {"$project": {"meal_entry_id": 1}},
+        {"$lookup": {
+            "from": "meal_entries",
+            "localField": "meal_entry_id",
+            "foreignField": "_id",
+            "as": "entry",
+        }},
+        {"$match": {"entry": {"$size": 0}}},
+        {"$project": {"_id": 1}},
+    ]
+
+    deleted = 0
+    orphan_ids = []
+    async for doc in db.notifications.aggregate(pipeline):
+        orphan_ids.append(doc["_id"])
+        if len(orphan_ids) >= batch_size:
+            result = await db.notifications.delete_many({"_id": {"$in": orphan_ids}})
+            deleted += result.deleted_count
+            orphan_ids = []
+
+    if orphan_ids:
+        result = await db.notifications.delete_many({"_id": {"$in": orphan_ids}})
+        deleted += result.deleted_count
+    return deleted
+
 
 # ----------------------------------------------------
 # LISTENER: create reminders for future meal_entries
@@ -55,97 +369,39 @@ async def ensure_unique_indexes():
 async def start_meal_notifications_listener(app=None):
     await ensure_unique_indexes()
 
+    try:
+        await generate_meal_reminders(datetime.utcnow())
+    except Exception as e:
+        print("Error generating meal reminders:", e)
+
+    reconcile_every = timedelta(minutes=settings.MEAL_REMINDER_RECONCILE_MINUTES)
+    next_reconcile = datetime.utcnow()
+    poll_every = timedelta(seconds=settings.MEAL_REMINDER_POLL_SECONDS)
+    next_poll = datetime.utcnow() + poll_every
+
     while True:
+        deadline = datetime.utcnow() + timedelta(seconds=60)
         try:
             now = datetime.utcnow()
+            if reminder_scheduler.window_expired(now):
+                await reminder_scheduler.load_window(now)
+                next_poll = now + poll_every
+            elif now >= next_poll:
+                # reminders written on other workers inside the current window
+                await reminder_scheduler.refresh_if_changed()
+                next_poll = now + poll_every
+
+            await reminder_scheduler.activate_due(now)
+
+            # Deleted meals are cleaned up by delete_meal_entries; this low-frequency
+            # pass only catches orphans left by writes outside those code paths.
+            if now >= next_reconcile:
+                await reconcile_orphan_meal_notifications()
+                next_reconcile = now + reconcile_every
 
-            entries = await db.meal_entries.find({
-                "date": {"$gte": now.strftime("%Y-%m-%d")}
-            }).to_list(length=None)
-
-            for entry in entries:
-                # -----------------------------------------------------------------
-                # FIX #1: STOP processing if the meal entry was deleted meanwhile
-                # -----------------------------------------------------------------
-                entry_exists = await db.meal_entries.find_one({"_id": entry["_id"]})
-                if not entry_exists:
-                    continue
-
-                meal = entry.get("meal")
-                if not meal:
-                    continue
-
-                user_id = entry.get("user_id")
-                slot = entry.get("slot")
-                day = entry.get("day")
-                meal_name = meal.get("name")
-
-                meal_date_str = entry.get("date")
-                try:
-                    meal_date = datetime.fromisoformat(meal_date_str)
-                except Exception:
-                    continue
-
-                meal_time = meal.get("time") or "12:00"
-                try:
-                    hour, minute = map(int, meal_time.split(":"))
-                except Exception:
-                    hour, minute = 12, 0
-
-                meal_datetime = meal_date.replace(hour=hour, minute=minute)
-
-                reminders = [
-                    (meal_datetime - timedelta(days=1), "1 day before"),
-                    (meal_datetime - timedelta(hours=1), "1 hour before")
-                ]
-
-                for send_at, label in reminders:
-                    if send_at <= now:
-                        continue
-
-                    exists = await db.notifications.find_one({
-                        "meal_entry_id": entry["_id"],
-                        "notif_label": label,
-                        "user_id": user_id,
-                        "type": "meal_reminder"
-                    })
-
-                    if exists:
-                        continue
-
-                    try:
-                        await db.notifications.insert_one({
-                            "user_id": user_id,
-                            "type": "meal_reminder",
-                            "title": f"Meal reminder: {meal_name}",
-                            "message": f"{slot.title()} on {day} ({label})",
-                            "created_at": datetime.utcnow(),
-                            "send_at": send_at,
-                            "meal_entry_id": entry["_id"],
-                            "notif_label": label,
-                            "is_read": False,
-                            "show_action": False
-                        })
-                    except Exception:
-                        pass
-
-            # ---------------------------------------------------------------
-            # FIX #2: Cleanup ALL old notifications for deleted meals
-            # ---------------------------------------------------------------
-            reminders = await db.notifications.find({
-                "meal_entry_id": {"$exists": True}
-            }).to_list(length=None)
-
-            for notif in reminders:
-                entry_id = notif.get("meal_entry_id")
-                if not entry_id:
-                    continue
-
-                entry_exists = await db.meal_entries.find_one({"_id": entry_id})
-                if not entry_exists:
-                    await db.notifications.delete_one({"_id": notif["_id"]})
+            deadline = min(reminder_scheduler.next_deadline(), next_reconcile, next_poll)
 
         except Exception as e:
             print("Error in meal notifications listener:", e)
 
-        await asyncio.sleep(60)
\ No newline at end of file
+        await reminder_scheduler.sleep_until(deadline)
\ No newline at end of file
@@ -1,47 +1,252 @@
 import asyncio
 from datetime import datetime
-from bson import ObjectId
-from app.database import db
-from app.routers.notifications import create_system_notification
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
+from app.database import client, db
+from app.config import settings
+from app.routers.notifications import build_system_notification
 
-async def user_event_listener():
+checkpoints = db["stream_checkpoints"]
+outbox = db["user_event_outbox"]
+counters = db["counters"]
+CHECKPOINT_ID = "user_events"
+
+# "change_stream" on replica sets / sharded clusters, "outbox" on a standalone mongod
+EVENT_SOURCE = "change_stream"
+
+# Server error codes meaning the saved resume token can no longer be used
+RESUME_TOKEN_LOST_CODES = {260, 280, 286}
+
+
+# ----------------------------------------------------
+# INDEXES
+# ----------------------------------------------------
+async def ensure_user_event_indexes():
+    # Replaying a batch after a crash must not duplicate its notifications
+    await db.notifications.create_index(
+        "event_key",
+        unique=True,
+        name="unique_event_key",
+        partialFilterExpression={"event_key": {"$exists": True}},
+    )
+    await outbox.create_index("seq", unique=True, name="outbox_seq")
+
+
+# ----------------------------------------------------
+# EVENT SOURCE: picked once at startup from server capabilities
+# ----------------------------------------------------
+async def detect_event_source() -> str:
+    """Change streams need a replica set or mongos; fall back to the outbox otherwise."""
+    global EVENT_SOURCE
+    try:
+        hello = await client.admin.command("hello")
+        supports_streams = "setName" in hello or hello.get("msg") == "isdbgrid"
+    except Exception as e:
+        print("Could not detect MongoDB topology, assuming change streams:", e)
+        supports_streams = True
+
+    EVENT_SOURCE = "change_stream" if supports_streams else "outbox"
+    return EVENT_SOURCE
+
+
+async def record_user_event(event: dict):
+    """
+    Append a user event to the outbox (standalone deployments only). On replica
+    sets the change stream already sees the underlying write, so this is a no-op.
+    """
+    if EVENT_SOURCE != "outbox":
+        return
+
+    counter = await counters.find_one_and_update(
+        {"_id": "user_event_outbox"},
+        {"$inc": {"seq": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    await outbox.insert_one({
+        "seq": counter["seq"],
+        "event": event,
+        "created_at": datetime.utcnow(),
+    })
+
+
+# ----------------------------------------------------
+# CHECKPOINT: persisted resume token
+# ----------------------------------------------------
+async def load_resume_token():
+    doc = await checkpoints.find_one({"_id": CHECKPOINT_ID})
+    return doc.get("resume_token") if doc else None
+
+
+async def save_resume_token(token):
+    await checkpoints.update_one(
+        {"_id": CHECKPOINT_ID},
+        {"$set": {"resume_token": token, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+# ----------------------------------------------------
+# HANDLERS: shared by the change stream and the outbox
+# ----------------------------------------------------
+def event_from_change(change: dict) -> dict | None:
+    """Translate a household_users change into a user event."""
+    if change["operationType"] == "insert":
+        return {
+            "type": "user_registered",
+            "full_name": change["fullDocument"].get("full_name", "New User"),
+        }
+
+    if change["operationType"] == "update":
+        updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+        user_doc = change.get("fullDocument")
+        if "last_login_at" in updated_fields and user_doc:
+            return {
+                "type": "user_login",
+                "email": user_doc.get("email", "Unknown user"),
+            }
+    return None
+
+
+def notification_for_event(event: dict, event_key: str) -> dict | None:
+    # ---------------------------
+    # NEW USER REGISTERED
+    # ---------------------------
+    if event["type"] == "user_registered":
+        doc = build_system_notification(
+            title="New User Signup",
+            message=f"{event.get('full_name', 'New User')} has registered an account."
+        )
+
+    # ---------------------------
+    # USER LOGGED IN
+    # ---------------------------
+    elif event["type"] == "user_login":
+        doc = build_system_notification(
+            title="User Login",
+            message=f"{event.get('email', 'Unknown user')} logged in."
+        )
+    else:
+        return None
+
+    doc["event_key"] = event_key
+    return doc
+
+
+async def insert_notifications(docs: list):
+    """Insert a batch of notifications, ignoring ones already written by a replayed batch."""
+    if not docs:
+        return
+    try:
+        await db.notifications.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+            raise
+
+
+# ----------------------------------------------------
+# SOURCE 1: change stream with persisted resume token
+# ----------------------------------------------------
+async def watch_user_changes():
     """
     Listen for inserts and updates in household_users and create notifications.
+    Events are drained in micro-batches; the resume token is checkpointed only
+    after a batch is written, so a restart resumes exactly where it left off.
     """
 
     pipeline = [{"$match": {"operationType": {"$in": ["insert", "update"]}}}]
 
     while True:
         try:
+            resume_token = await load_resume_token()
+
             # Use full_document="updateLookup" so we can access full document on update
-            async with db.household_users.watch(pipeline, full_document="updateLookup") as stream:
-                async for change in stream:
-                    # ---------------------------
-                    # NEW USER REGISTERED
-                    # ---------------------------
-                    if change["operationType"] == "insert":
-                        full_name = change["fullDocument"].get("full_name", "New User")
-                        await create_system_notification(
-                            title="New User Signup",
-                            message=f"{full_name} has registered an account."
+            async with db.household_users.watch(
+                pipeline,
+                full_document="updateLookup",
+                resume_after=resume_token,
+                max_await_time_ms=settings.USER_EVENT_MAX_AWAIT_MS,
+            ) as stream:
+                while stream.alive:
+                    docs = []
+                    last_token = None
+                    drained = 0
+
+                    # drain whatever the server has ready, up to one batch
+                    while drained < settings.USER_EVENT_BATCH_SIZE:
+                        change = await stream.try_next()
+                        if change is None:
+                            break
+
+                        drained += 1
+                        last_token = change["_id"]
+                        event = event_from_change(change)
+                        doc = event and notification_for_event(
+                            event, f"{CHECKPOINT_ID}:{last_token['_data']}"
                         )
+                        if doc:
+                            docs.append(doc)
+
+                    if last_token is not None:
+                        await insert_notifications(docs)
+                        await save_resume_token(last_token)
 
-                    # ---------------------------
-                    # USER LOGGED IN
-                    # ---------------------------
-                    if change["operationType"] == "update":
-                        updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
-
-                        if "last_login_at" in updated_fields:
-                            user_doc = change.get("fullDocument")
-                            if user_doc:
-                                email = user_doc.get("email", "Unknown user")
-                                await create_system_notification(
-                                    title="User Login",
-                                    message=f"{email} logged in."
-                                )
+        except OperationFailure as e:
+            if e.code in RESUME_TOKEN_LOST_CODES:
+                print("User event resume token no longer valid, restarting from now:", e)
+                await checkpoints.delete_one({"_id": CHECKPOINT_ID})
+            else:
+                print("User event listener stopped:", e)
+            await asyncio.sleep(5)
 
         except Exception as e:
             print("User event listener stopped:", e)
             # Sleep before restarting to prevent infinite rapid restart loop
-            await asyncio.sleep(5)
\ No newline at end of file
+            await asyncio.sleep(5)
+
+
+# ----------------------------------------------------
+# SOURCE 2: outbox poller (standalone mongod)
+# ----------------------------------------------------
+async def drain_user_event_outbox():
+    """
+    Poll the outbox in seq order, write each batch of notifications, then delete
+    the drained entries. Entries stay put until their notifications are written.
+    """
+    poll_interval = settings.USER_EVENT_MAX_AWAIT_MS / 1000
+
+    while True:
+        try:
+            batch = await outbox.find().sort("seq", 1).limit(
+                settings.USER_EVENT_BATCH_SIZE
+            ).to_list(length=settings.USER_EVENT_BATCH_SIZE)
+
+            if not batch:
+                await asyncio.sleep(poll_interval)
+                continue
+
+            docs = []
+            for entry in batch:
+                doc = notification_for_event(entry["event"], f"outbox:{entry['seq']}")
+                if doc:
+                    docs.append(doc)
+
+            await insert_notifications(docs)
+            await outbox.delete_many({"_id": {"$in": [entry["_id"] for entry in batch]}})
+
+        except Exception as e:
+            print("User event outbox poller stopped:", e)
+            await asyncio.sleep(5)
+
+
+# ----------------------------------------------------
+# LISTENER
+# ----------------------------------------------------
+async def user_event_listener():
+    """Run the user event handlers on whichever source detect_event_source picked."""
+    await ensure_user_event_indexes()
+
+    if EVENT_SOURCE == "outbox":
+        await drain_user_event_outbox()
+    else:
+        await watch_user_changes()
@@ -0,0 +1,158 @@
+# app/login_benchmark.py
+"""
+Login burst benchmark.
+
+Fires a burst of concurrent /auth/login requests at a running API while a
+probe keeps calling an unrelated endpoint, then reports login throughput and
+the probe's latency before and during the burst. A healthy event loop keeps
+the probe p99 close to its baseline even while bcrypt is busy.
+
+Throughput and login latency count successful (200) logins only; requests
+shed by admission control (503) return without hashing and are reported
+separately, so they cannot inflate the numbers.
+
+Login is throttled per email (RATE_LIMIT_IDENTITY_PER_MINUTE) and per IP
+(RATE_LIMIT_IP_PER_MINUTE), so a burst against one account measures the rate
+limiter, not bcrypt. Spread the burst over several seeded accounts with an
+"{n}" placeholder in --email, and list the benchmark host in
+RATE_LIMIT_EXEMPT_IPS on the server under test. The run exits non-zero when
+429s make up most of the burst.
+
+Usage (API must be running and the accounts must be active):
+    python -m app.login_benchmark --email bench{n}@example.com --accounts 50 --password secret [--register]
+"""
+import argparse
+import asyncio
+import itertools
+import sys
+import time
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, latencies):
+    print(
+        f"{label:<22} n={len(latencies):<5} "
+        f"p50={percentile(latencies, 50) * 1000:7.1f} ms  "
+        f"p99={percentile(latencies, 99) * 1000:7.1f} ms"
+    )
+
+
+async def probe(client, path, stop, latencies, interval):
+    """Call an unrelated endpoint at a steady rate until told to stop."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+def account_emails(args):
+    """--email with "{n}" expands to --accounts addresses (n = 1..accounts)."""
+    if "{n}" not in args.email:
+        return [args.email]
+    return [args.email.format(n=n) for n in range(1, args.accounts + 1)]
+
+
+async def register_accounts(client, args):
+    """Create the benchmark accounts (active, no 2FA); existing ones are kept."""
+    for email in account_emails(args):
+        response = await client.post("/auth/register", json={
+            "full_name": "Login Benchmark", "email": email, "password": args.password,
+        })
+        if response.status_code not in (200, 400):
+            raise SystemExit(f"❌ Could not register {email}: {response.status_code} {response.text}")
+
+
+async def login_burst(client, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    emails = itertools.cycle(account_emails(args))
+    latencies = []  # successful logins only
+    rejected = []   # 503 / 429 and any other non-200 answer
+    statuses = {}
+
+    async def one_login(email):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/auth/login", json={"email": email, "password": args.password}
+            )
+            took = time.perf_counter() - started
+            (latencies if response.status_code == 200 else rejected).append(took)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login(next(emails)) for _ in range(args.logins)))
+    return time.perf_counter() - started, latencies, rejected, statuses
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="EcoEats login burst benchmark")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True, help='e.g. bench{n}@example.com')
+    parser.add_argument("--password", required=True, help="shared by every benchmark account")
+    parser.add_argument("--accounts", type=int, default=1,
+                        help='number of accounts when --email contains "{n}"')
+    parser.add_argument("--register", action="store_true",
+                        help="register the accounts before the run")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-path", default="/notifications/unread_count")
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    parser.add_argument("--baseline-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        if args.register:
+            await register_accounts(client, args)
+
+        # 1️⃣ Baseline: probe latency with no login load
+        baseline = []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(
+            probe(client, args.probe_path, stop, baseline, args.probe_interval)
+        )
+        await asyncio.sleep(args.baseline_seconds)
+        stop.set()
+        await probe_task
+
+        # 2️⃣ Burst: probe latency while logins hammer bcrypt
+        during = []
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(
+            probe(client, args.probe_path, stop, during, args.probe_interval)
+        )
+        elapsed, login_latencies, rejected, statuses = await login_burst(client, args)
+        stop.set()
+        await probe_task
+
+    succeeded = len(login_latencies)
+    print(f"Logins: {succeeded}/{args.logins} succeeded in {elapsed:.2f}s -> {succeeded / elapsed:.1f} logins/s")
+    print(f"Rejected: {len(rejected)} (503 overloaded: {statuses.get(503, 0)}, 429 throttled: {statuses.get(429, 0)})")
+    print(f"Login status codes: {statuses}")
+    report("login (200)", login_latencies)
+    report("login (rejected)", rejected)
+    report("probe (baseline)", baseline)
+    report("probe (during burst)", during)
+
+    throttled = statuses.get(429, 0)
+    if throttled * 2 > args.logins:
+        print(
+            f"❌ {throttled}/{args.logins} logins were rate limited (429): the results "
+            "measure the limiter, not login. Use more --accounts and add this host "
+            "to RATE_LIMIT_EXEMPT_IPS on the server."
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.database import db
-from app.routers import auth, inventory, browse, donation, mealplan, analytics, notifications
+from app.routers import auth, inventory, browse, donation, mealplan, analytics, notifications, metrics, exports
 from app.routers.mealplan_templates import router as mealplan_templates_router
 
 # Listeners
 import asyncio
-from app.listeners.user_events import user_event_listener
+from app.listeners.user_events import user_event_listener, detect_event_source
 from app.listeners.meal_notifications import start_meal_notifications_listener
+from app.listeners.email_outbox import start_email_workers
+from app.listeners.expiry_digest import start_expiry_digest_scheduler
+from app.listeners.inventory_ledger import ensure_inventory_ledger, start_expiry_sweeper
+from app.listeners.analytics_rollups import ensure_rollup_indexes
+from app.security import ensure_security_indexes, start_revocation_sync
+from app.rate_limit import ensure_rate_limit_indexes
+from app.listeners.leases import ensure_lease_indexes, run_as_leader, release_all_leases
 
 app = FastAPI(title="EcoEats Backend")
 
@@ -30,16 +37,58 @@ app.include_router(analytics.router, prefix="/analytics", tags=["Analytics"])
 app.include_router(mealplan.router)
 app.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
 app.include_router(mealplan_templates_router, prefix="/mealplan-templates", tags=["Mealplan Templates"])
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
+app.include_router(exports.router, prefix="/exports", tags=["Exports"])
 
 # ----------------------
 # Startup Event: Run Listeners
 # ----------------------
+# Keep references to the leader loops so they are not garbage collected
+background_tasks = set()
+
 @app.on_event("startup")
 async def startup_listeners():
     """
-    Run both background listeners:
+    Run the background listeners, each on exactly one worker (Mongo lease):
     1. user_event_listener -> handles signup/login notifications
+       (change stream, or the outbox on a standalone mongod)
     2. start_meal_notifications_listener -> handles meal reminders
+    3. start_email_workers -> sends queued emails over pooled SMTP sessions
+    4. start_expiry_digest_scheduler -> daily expiring-items digest emails
+    5. start_expiry_sweeper -> records expire events in the inventory ledger
     """
-    asyncio.create_task(user_event_listener())
-    asyncio.create_task(start_meal_notifications_listener(app))
\ No newline at end of file
+    await ensure_lease_indexes()
+    await ensure_security_indexes()
+    await ensure_rate_limit_indexes()
+    await auth.ensure_auth_indexes()
+    await analytics.ensure_analytics_indexes()
+    await exports.ensure_export_indexes()
+    # every worker records ledger events, not just the sweep leader
+    await ensure_inventory_ledger()
+    await ensure_rollup_indexes()
+    await detect_event_source()
+
+    jobs = {
+        "user_events": user_event_listener,
+        "meal_notifications": lambda: start_meal_notifications_listener(app),
+        "email_outbox": start_email_workers,
+        "expiry_digest": start_expiry_digest_scheduler,
+        "inventory_ledger": start_expiry_sweeper,
+    }
+    for name, job_factory in jobs.items():
+        task = asyncio.create_task(run_as_leader(name, job_factory))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    # Every worker keeps its own copy of the token revocation set
+    task = asyncio.create_task(start_revocation_sync())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+@app.on_event("shutdown")
+async def shutdown_listeners():
+    """Release held leases so another worker takes over without waiting for the TTL."""
+    for task in list(background_tasks):
+        task.cancel()
+    await release_all_leases()
\ No newline at end of file
@@ -0,0 +1,101 @@
+# app/normalize_dates.py
+"""
+One-off migration: store every food_items date as a BSON date.
+
+Older writers left created_at / expiry_date (and friends) as strings, which
+forced analytics to convert them per document before it could filter. This
+rewrites them in _id-ordered batches, then installs a $jsonSchema validator so
+new string dates are rejected. Values that cannot be parsed are left alone and
+reported; the "moderate" validation level lets those documents still be edited.
+
+Usage:
+    python -m app.normalize_dates [--batch-size 500] [--dry-run]
+"""
+import argparse
+import asyncio
+from pymongo import UpdateOne
+from app.database import db
+from app.routers.analytics import as_utc, ensure_analytics_indexes
+
+DATE_FIELDS = ["created_at", "updated_at", "donated_at", "expiry_date"]
+
+FOOD_ITEM_VALIDATOR = {
+    "$jsonSchema": {
+        "bsonType": "object",
+        "properties": {
+            "created_at": {"bsonType": "date"},
+            "updated_at": {"bsonType": "date"},
+            "donated_at": {"bsonType": "date"},
+            # inventory updates clear the expiry with null
+            "expiry_date": {"bsonType": ["date", "null"]},
+        },
+    }
+}
+
+
+async def normalize_batch(docs: list, dry_run: bool) -> tuple[int, int]:
+    ops = []
+    unparsable = 0
+    for doc in docs:
+        changes = {}
+        for field in DATE_FIELDS:
+            value = doc.get(field)
+            if not isinstance(value, str):
+                continue
+            parsed = as_utc(value)
+            if parsed is None:
+                unparsable += 1
+                print(f"⚠️ {doc['_id']}: could not parse {field}={value!r}")
+                continue
+            changes[field] = parsed
+        if changes:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+
+    if ops and not dry_run:
+        await db.food_items.bulk_write(ops, ordered=False)
+    return len(ops), unparsable
+
+
+async def normalize_dates(batch_size: int, dry_run: bool):
+    string_dates = {"$or": [{field: {"$type": "string"}} for field in DATE_FIELDS]}
+    projection = {field: 1 for field in DATE_FIELDS}
+    last_id = None
+    updated = 0
+    unparsable = 0
+
+    while True:
+        query = string_dates if last_id is None else {"$and": [string_dates, {"_id": {"$gt": last_id}}]}
+        docs = await db.food_items.find(query, projection).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+        batch_updated, batch_unparsable = await normalize_batch(docs, dry_run)
+        updated += batch_updated
+        unparsable += batch_unparsable
+        last_id = docs[-1]["_id"]
+
+    verb = "Would update" if dry_run else "Updated"
+    print(f"✅ {verb} {updated} item(s); {unparsable} value(s) left unparsed")
+    if dry_run:
+        return
+
+    if "food_items" in await db.list_collection_names():
+        await db.command(
+            "collMod", "food_items",
+            validator=FOOD_ITEM_VALIDATOR,
+            validationLevel="moderate",
+            validationAction="error",
+        )
+    else:
+        await db.create_collection(
+            "food_items", validator=FOOD_ITEM_VALIDATOR, validationLevel="moderate"
+        )
+    await ensure_analytics_indexes()
+    print("✅ food_items date validator and created_at index in place")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Normalize food_items dates to BSON dates")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(normalize_dates(args.batch_size, args.dry_run))
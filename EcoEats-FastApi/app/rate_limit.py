@@ -0,0 +1,109 @@
+# app/rate_limit.py
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Request
+from pymongo import ReturnDocument
+from app.config import settings
+from app.database import db
+
+rate_limits = db["rate_limits"]
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by string, kept in one bounded LRU dict of
+    [tokens, last_refill] pairs. Least recently seen keys are evicted first,
+    which simply hands them a full bucket if they come back.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def _refill(self, key: str, rate: float, capacity: float, now: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [capacity, now]
+            self._buckets[key] = bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def take(self, limits: list) -> float:
+        """
+        `limits` is a list of (key, per_minute). Takes one token from every bucket
+        when all have one; otherwise takes none and returns seconds to wait.
+        """
+        now = time.monotonic()
+        buckets = []
+        wait = 0.0
+        for key, per_minute in limits:
+            rate = per_minute / 60
+            bucket = self._refill(key, rate, float(per_minute), now)
+            if bucket[0] < 1:
+                wait = max(wait, (1 - bucket[0]) / rate)
+            buckets.append(bucket)
+
+        if wait:
+            return wait
+        for bucket in buckets:
+            bucket[0] -= 1
+        return 0.0
+
+
+limiter = TokenBucketLimiter(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+# benchmark hosts; per-identity limits still apply to them
+EXEMPT_IPS = {ip.strip() for ip in settings.RATE_LIMIT_EXEMPT_IPS.split(",") if ip.strip()}
+
+
+async def _take_shared(limits: list) -> float:
+    """Fixed one-minute windows in Mongo so the limit holds across workers."""
+    now = datetime.utcnow()
+    window = now.replace(second=0, microsecond=0)
+    for key, per_minute in limits:
+        doc = await rate_limits.find_one_and_update(
+            {"_id": f"{key}:{window:%Y%m%d%H%M}"},
+            {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": window + timedelta(minutes=2)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["count"] > per_minute:
+            return (window + timedelta(minutes=1) - now).total_seconds()
+    return 0.0
+
+
+async def ensure_rate_limit_indexes():
+    if settings.RATE_LIMIT_SHARED:
+        await rate_limits.create_index("expires_at", expireAfterSeconds=0, name="rate_limit_ttl")
+
+
+async def enforce_rate_limit(action: str, request: Request, identity: str | None = None):
+    """
+    Reject the request with 429 once the caller's IP or the targeted identity
+    (email / user id) is over its per-minute budget for `action`. Call it first
+    thing in a handler, before any password hashing or database access.
+    """
+    ip = request.client.host if request.client else "unknown"
+    limits = []
+    if ip not in EXEMPT_IPS:
+        limits.append((f"{action}:ip:{ip}", settings.RATE_LIMIT_IP_PER_MINUTE))
+    if identity:
+        limits.append((f"{action}:id:{str(identity).lower()}", settings.RATE_LIMIT_IDENTITY_PER_MINUTE))
+
+    wait = limiter.take(limits)
+    if not wait and settings.RATE_LIMIT_SHARED:
+        wait = await _take_shared(limits)
+
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts. Please wait a moment and try again.",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
@@ -1,9 +1,16 @@
 # app/routers/analytics.py
+import asyncio
 from fastapi import APIRouter, HTTPException, Query
-from app.database import db
-from datetime import datetime, timedelta, time
+from app.database import db, analytics_db
+from app.cache import TTLCache
+from app.config import settings
+from app.forecast import OUTCOMES, weekly_matrix, holt_forecast
+from app.listeners.analytics_rollups import REBUILD_VERSION, version_id
+import numpy as np
+from datetime import datetime, timedelta, time, timezone
 from typing import Optional, Union, List
 from collections import defaultdict
+import math
 
 try:
     from dateutil.parser import parse
@@ -22,6 +29,7 @@ except Exception:
 
 router = APIRouter(tags=["Analytics"])
 collection = db["food_items"]
+rollups = analytics_db["daily_rollups"]
 
 def ensure_datetime(date_value: Union[str, datetime, None]) -> Optional[datetime]:
     if isinstance(date_value, datetime):
@@ -34,60 +42,200 @@ def ensure_datetime(date_value: Union[str, datetime, None]) -> Optional[datetime
     return None
 
 
-def build_aggregation_pipeline(start_date: Optional[str], end_date: Optional[str], category: Optional[str]) -> List[dict]:
-    match_criteria = {}
-    pipeline = []
+def as_utc(date_value: Union[str, datetime, None]) -> Optional[datetime]:
+    """ensure_datetime, normalized to naive UTC like the dates Motor returns"""
+    dt = ensure_datetime(date_value)
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
 
-    if category:
-        match_criteria["category"] = category
 
-    add_fields_stage = {
-        "$addFields": {
-            "created_at_date": {
-                "$cond": {
-                    "if": {"$eq": [{"$type": "$created_at"}, "string"]},
-                    "then": {"$dateFromString": {"dateString": "$created_at"}},
-                    "else": "$created_at"
-                }
-            }
-        }
-    }
-    pipeline.append(add_fields_stage)
+def parse_day_range(start_date: Optional[str], end_date: Optional[str]):
+    try:
+        start_day = datetime.combine(parse(start_date).date(), time.min)
+        end_day = datetime.combine(parse(end_date).date(), time.min)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date format: {e}. Use YYYY-MM-DD")
+    return start_day, end_day
 
-    if start_date and end_date:
-        try:
-            start_dt = datetime.combine(parse(start_date).date(), time.min)
-            end_dt = datetime.combine(parse(end_date).date(), time.max)
-            match_criteria["created_at_date"] = {"$gte": start_dt, "$lte": end_dt}
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid date format: {e}. Use YYYY-MM-DD")
 
-    if match_criteria:
-        pipeline.append({"$match": match_criteria})
-    return pipeline
+async def ensure_analytics_indexes():
+    # created_at leads so date-range matches on raw items use an index
+    await collection.create_index([("created_at", 1), ("category", 1)], name="created_at_category")
 
 
-@router.get("/summary")
-async def get_analytics_summary(
-    start_date: Optional[str] = Query(None),
-    end_date: Optional[str] = Query(None),
-    category: Optional[str] = Query(None)
-):
-    """Get summary statistics for food saved and donated"""
-    pipeline = build_aggregation_pipeline(start_date, end_date, category)
-    
+# ----------------------------------------------------
+# Item parsing (shared with the ledger and exports)
+# ----------------------------------------------------
+def parse_quantity(value) -> int:
+    """int(float(quantity)), falling back to 1 for missing or unparsable values"""
+    if value is None:
+        return 1
     try:
-        all_items = await collection.aggregate(pipeline).to_list(length=None)
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 1
+
+
+PERIOD_FORMATS = {
+    "weekly": "%Y-W%U",  # e.g. "2025-W45"
+    "monthly": "%Y-%m",
+    "yearly": "%Y",
+}
+
+
+# ----------------------------------------------------
+# Rollup reads (daily_rollups, see app/listeners/analytics_rollups.py)
+# ----------------------------------------------------
+def rollup_match(start_date: Optional[str], end_date: Optional[str], category: Optional[str]) -> dict:
+    # no filter on items: reversal events make rows net out algebraically
+    match_criteria = {}
+    if category:
+        match_criteria["category"] = category
+    if start_date and end_date:
+        start_day, end_day = parse_day_range(start_date, end_date)
+        match_criteria["day"] = {"$gte": start_day, "$lte": end_day}
+    return match_criteria
+
+
+def bucket_stage(period: str) -> dict:
+    """
+    Collapse daily rollup rows into (category, period, donation, outcome) rows
+    with summed quantities. Everything the endpoints report is folded from these.
+    """
+    return {"$group": {
+        "_id": {
+            "category": "$category",
+            "period": {"$dateToString": {"format": PERIOD_FORMATS[period], "date": "$day"}},
+            "donation": {"$eq": ["$source", "donation"]},
+            "outcome": "$outcome",
+        },
+        "quantity": {"$sum": "$quantity"},
+        # only needed for confidence intervals in approximate mode
+        "quantity_sq": {"$sum": {"$multiply": ["$quantity", "$quantity"]}},
+    }}
+
+
+def source_stages(match_criteria: dict, sample: Optional[dict]) -> List[dict]:
+    if sample:
+        # $sample must be the first stage to use MongoDB's random cursor (a
+        # $sample after $match reads and sorts every matched row). The filter
+        # is then a domain of the whole-collection sample: rows outside it
+        # count as zeros, which interval() already accounts for.
+        return [{"$sample": {"size": sample["size"]}}, {"$match": match_criteria}]
+    return [{"$match": match_criteria}]
+
+
+def flatten_rows(rows: List[dict], sample: Optional[dict] = None) -> List[dict]:
+    flat = [
+        {**row["_id"], "quantity": row["quantity"], "quantity_sq": row.get("quantity_sq", 0)}
+        for row in rows
+    ]
+    if sample:
+        scale = sample["population"] / sample["size"]
+        for row in flat:
+            row["sample_sum"] = row["quantity"]
+            row["quantity"] = round(row["quantity"] * scale)
+    return flat
+
+
+async def fetch_bucket_rows(match_criteria: dict, period: str, sample: Optional[dict] = None) -> List[dict]:
+    try:
+        rows = await rollups.aggregate(
+            source_stages(match_criteria, sample) + [bucket_stage(period)]
+        ).to_list(length=None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database aggregation failed: {e}")
+    return flatten_rows(rows, sample)
+
+
+# ----------------------------------------------------
+# Approximate mode: uniform $sample of rollup rows
+# ----------------------------------------------------
+APPROX_Z = 1.96  # 95% confidence
+
+
+async def choose_sample(approx: Optional[bool]) -> Optional[dict]:
+    """
+    None for an exact answer. approx=None samples only once the rollup
+    collection is larger than ANALYTICS_APPROX_THRESHOLD rows; the size comes
+    from collection metadata, so deciding costs no scan.
+    """
+    if approx is False:
+        return None
+    population = await rollups.estimated_document_count()
+    if approx is None and population <= settings.ANALYTICS_APPROX_THRESHOLD:
+        return None
+    size = min(settings.ANALYTICS_SAMPLE_SIZE, population)
+    if size == 0 or size >= population:
+        return None  # a sample of everything is the exact answer
+    return {"size": size, "population": population}
+
+
+def interval(rows: List[dict], sample: dict) -> dict:
+    """
+    Estimate of the summed quantity over `rows` with a normal-approximation
+    interval. Every sampled rollup row lands in exactly one bucket, so bucket
+    sums and sums of squares add up to the per-row moments of the subset;
+    sampled rows outside the request's filter or the subset contribute zeros
+    to those moments (a domain estimate over the whole collection).
+    """
+    n, population = sample["size"], sample["population"]
+    total = sum(row["sample_sum"] for row in rows)
+    total_sq = sum(row["quantity_sq"] for row in rows)
+    estimate = population / n * total
+
+    variance = 0.0
+    if n > 1:
+        s2 = max(0.0, (total_sq - total * total / n) / (n - 1))
+        variance = population * population * (1 - n / population) * s2 / n
+    margin = APPROX_Z * math.sqrt(variance)
+
+    return {
+        "estimate": round(estimate),
+        "low": max(0, round(estimate - margin)),
+        "high": round(estimate + margin),
+    }
+
+
+def intervals_by(rows: List[dict], sample: dict, field: str) -> dict:
+    groups = defaultdict(list)
+    for row in rows:
+        if row[field] is not None:
+            groups[row[field]].append(row)
+    return {key: interval(group, sample) for key, group in sorted(groups.items())}
+
 
-    if not all_items:
+def summary_intervals(rows: List[dict], sample: dict) -> dict:
+    return {
+        "totalItems": interval(rows, sample),
+        "totalDonations": interval([r for r in rows if r["outcome"] == "donated"], sample),
+        "totalUsed": interval([r for r in rows if r["outcome"] == "used"], sample),
+        "totalWasted": interval([r for r in rows if r["outcome"] == "wasted"], sample),
+        "categories": intervals_by(rows, sample, "category"),
+    }
+
+
+def with_approximation(result: dict, sample: Optional[dict], intervals) -> dict:
+    if sample and result.get("hasData", True):
+        result["approximate"] = {
+            "sampleSize": sample["size"],
+            "population": sample["population"],
+            "confidence": 0.95,
+            "intervals": intervals(),
+        }
+    return result
+
+
+def fold_summary(rows: List[dict], recent_only: bool) -> dict:
+    if not rows:
         return {
             "hasData": False,
             "message": "No data found for the selected filters.",
             "totalItems": 0,
             "totalDonations": 0,
             "totalUsed": 0,
+            "totalWasted": 0,
             "categoriesBreakdown": {},
             "monthlyTrend": [],
             "impactMetrics": {
@@ -97,122 +245,175 @@ async def get_analytics_summary(
             }
         }
 
-    total_items = 0
-    total_donations = 0
-    total_inventory = 0
-    category_stats = defaultdict(lambda: {"total": 0, "donated": 0, "used": 0})
-
-    for item in all_items:
-        qty_raw = item.get("quantity", 1)
-        try:
-            quantity = int(float(qty_raw))
-        except (TypeError, ValueError):
-            quantity = 1
-
-        cat = item.get("category", "Unknown")
-
-        if item.get("source") == "donation":
-            category_stats[cat]["donated"] += quantity
-            total_donations += quantity
-        else:
-            category_stats[cat]["used"] += quantity
-            total_inventory += quantity
-
-        category_stats[cat]["total"] += quantity
-        total_items += quantity
-
-    # Monthly trend
-    trend_data = defaultdict(lambda: {"inventory": 0, "donations": 0})
-    for item in all_items:
-        qty_raw = item.get("quantity", 1)
-        try:
-            quantity = int(float(qty_raw))
-        except (TypeError, ValueError):
-            quantity = 1
-
-        created = item.get("created_at_date")
-        if created:
-            month_key = created.strftime("%Y-%m")
-            if item.get("source") == "donation":
-                trend_data[month_key]["donations"] += quantity
+    totals = {"donated": 0, "used": 0, "wasted": 0}
+    category_stats = defaultdict(lambda: {"total": 0, "donated": 0, "used": 0, "wasted": 0})
+    trend_data = defaultdict(lambda: {"inventory": 0, "donations": 0, "wasted": 0})
+
+    for row in rows:
+        quantity = row["quantity"]
+        outcome = row["outcome"]
+        stats = category_stats[row["category"]]
+
+        totals[outcome] += quantity
+        stats[outcome] += quantity
+        stats["total"] += quantity
+
+        # Monthly trend
+        if row["period"]:
+            trend = trend_data[row["period"]]
+            if outcome == "donated":
+                trend["donations"] += quantity
+            elif outcome == "used":
+                trend["inventory"] += quantity
             else:
-                trend_data[month_key]["inventory"] += quantity
+                trend["wasted"] += quantity
 
     monthly_trend = [
-        {"date": month, "inventory": data["inventory"], "donations": data["donations"]}
+        {"date": month, "inventory": data["inventory"], "donations": data["donations"],
+         "wasted": data["wasted"]}
         for month, data in sorted(trend_data.items())
     ]
 
-    if not start_date and not end_date:
+    if recent_only:
         monthly_trend = monthly_trend[-6:]
 
+    # wasted food was not saved, so it stays out of the impact metrics
+    saved = totals["used"] + totals["donated"]
     return {
         "hasData": True,
-        "totalItems": total_items,
-        "totalDonations": total_donations,
-        "totalUsed": total_inventory,
+        "totalItems": sum(totals.values()),
+        "totalDonations": totals["donated"],
+        "totalUsed": totals["used"],
+        "totalWasted": totals["wasted"],
         "categoriesBreakdown": dict(category_stats),
         "monthlyTrend": monthly_trend,
         "impactMetrics": {
-            "foodSavedKg": total_items * 0.5,
-            "co2SavedKg": total_items * 2.5,
-            "moneySaved": total_items * 5
+            "foodSavedKg": saved * 0.5,
+            "co2SavedKg": saved * 2.5,
+            "moneySaved": saved * 5
         }
     }
 
 
+def fold_categories(rows: List[dict]) -> dict:
+    if not rows:
+        return {"hasData": False, "categoriesBreakdown": {}}
+
+    category_stats = defaultdict(lambda: {"total": 0, "donated": 0, "used": 0, "wasted": 0})
+    for row in rows:
+        stats = category_stats[row["category"]]
+        stats[row["outcome"]] += row["quantity"]
+        stats["total"] += row["quantity"]
+
+    return {"hasData": True, "categoriesBreakdown": dict(category_stats)}
+
+
+def fold_trends(rows: List[dict]) -> dict:
+    if not rows:
+        return {"hasData": False, "trend": []}
+
+    trend_data = defaultdict(lambda: {"saved": 0, "donated": 0, "wasted": 0})
+    for row in rows:
+        # items without a creation date cannot be placed on the timeline
+        if not row["period"]:
+            continue
+        outcome = "saved" if row["outcome"] == "used" else row["outcome"]
+        trend_data[row["period"]][outcome] += row["quantity"]
+
+    trend_list = [
+        {"period": k, "saved": v["saved"], "donated": v["donated"], "wasted": v["wasted"]}
+        for k, v in sorted(trend_data.items())
+    ]
+
+    return {"hasData": True, "trend": trend_list}
+
+
+# ----------------------------------------------------
+# Result cache with single-flight
+# ----------------------------------------------------
+analytics_cache = TTLCache(maxsize=settings.ANALYTICS_CACHE_SIZE)
+
+# cache key -> task computing it; identical concurrent requests await the same task
+_in_flight = {}
+
+
+def normalize_day(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    try:
+        return parse(value).date().isoformat()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date format: {e}. Use YYYY-MM-DD")
+
+
+def result_ttl(end_day: Optional[str]) -> int:
+    """Ranges that reach today still change; closed ranges only drift slowly."""
+    if end_day is None or end_day >= datetime.utcnow().date().isoformat():
+        return settings.ANALYTICS_CACHE_LIVE_TTL_SECONDS
+    return settings.ANALYTICS_CACHE_CLOSED_TTL_SECONDS
+
+
+async def cached_result(endpoint: str, start_date, end_date, category, period, approx, compute):
+    start_day, end_day = normalize_day(start_date), normalize_day(end_date)
+    key = (endpoint, start_day, end_day, category or None, period, approx)
+
+    result = analytics_cache.get(key)
+    if result is not None:
+        return result
+
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(compute())
+        _in_flight[key] = task
+
+        def store(done):
+            _in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None:
+                analytics_cache.set(key, done.result(), ttl=result_ttl(end_day))
+
+        task.add_done_callback(store)
+
+    # shield: one caller disconnecting must not cancel the shared computation
+    return await asyncio.shield(task)
+
+
+# ----------------------------------------------------
+# Routes
+# ----------------------------------------------------
+@router.get("/summary")
+async def get_analytics_summary(
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    approx: Optional[bool] = Query(None)
+):
+    """Get summary statistics for food saved and donated"""
+    async def compute():
+        match_criteria = rollup_match(start_date, end_date, category)
+        sample = await choose_sample(approx)
+        rows = await fetch_bucket_rows(match_criteria, "monthly", sample)
+        result = fold_summary(rows, recent_only=not start_date and not end_date)
+        return with_approximation(result, sample, lambda: summary_intervals(rows, sample))
+
+    return await cached_result("summary", start_date, end_date, category, None, approx, compute)
+
+
 @router.get("/categories")
 async def get_category_breakdown(
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    category: Optional[str] = Query(None)
+    category: Optional[str] = Query(None),
+    approx: Optional[bool] = Query(None)
 ):
     """Get analytics by category"""
-    pipeline = build_aggregation_pipeline(start_date, end_date, category)
-    
-    try:
-        all_items = await collection.aggregate(pipeline).to_list(length=None)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database aggregation failed: {e}")
+    async def compute():
+        match_criteria = rollup_match(start_date, end_date, category)
+        sample = await choose_sample(approx)
+        rows = await fetch_bucket_rows(match_criteria, "monthly", sample)
+        result = fold_categories(rows)
+        return with_approximation(result, sample, lambda: intervals_by(rows, sample, "category"))
 
-    if not all_items:
-        return {"hasData": False, "categoriesBreakdown": {}}
-
-    category_stats = defaultdict(lambda: {"total": 0, "donated": 0, "used": 0, "wasted": 0})
-    
-    for item in all_items:
-        qty_raw = item.get("quantity", 1)
-        try:
-            quantity = int(float(qty_raw))
-        except (TypeError, ValueError):
-            quantity = 1
-
-        cat = item.get("category", "Unknown")
-
-        # Check if expired (wasted)
-        expiry = item.get("expiry_date")
-        is_wasted = False
-        
-        if expiry:
-            if isinstance(expiry, str):
-                try:
-                    expiry = parse(expiry)
-                except Exception:
-                    expiry = None
-            
-            if expiry and expiry < datetime.utcnow():
-                is_wasted = True
-                category_stats[cat]["wasted"] += quantity
-
-        if not is_wasted:
-            if item.get("source") == "donation":
-                category_stats[cat]["donated"] += quantity
-            else:
-                category_stats[cat]["used"] += quantity
-        
-        category_stats[cat]["total"] += quantity
-
-    return {"hasData": True, "categoriesBreakdown": dict(category_stats)}
+    return await cached_result("categories", start_date, end_date, category, None, approx, compute)
 
 
 @router.get("/trends")
@@ -220,67 +421,162 @@ async def get_trends(
     period: str = Query("monthly"),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    category: Optional[str] = Query(None)
+    category: Optional[str] = Query(None),
+    approx: Optional[bool] = Query(None)
 ):
     """Return trend data grouped by the selected period (weekly, monthly, or yearly)."""
-    
-    # Build aggregation pipeline with filters
-    pipeline = build_aggregation_pipeline(start_date, end_date, category)
-    
-    try:
-        all_items = await collection.aggregate(pipeline).to_list(length=None)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database aggregation failed: {e}")
+    if period not in PERIOD_FORMATS:
+        period = "monthly"  # monthly default
 
-    if not all_items:
-        return {"hasData": False, "trend": []}
+    async def compute():
+        match_criteria = rollup_match(start_date, end_date, category)
+        sample = await choose_sample(approx)
+        rows = await fetch_bucket_rows(match_criteria, period, sample)
+        result = fold_trends(rows)
+        return with_approximation(result, sample, lambda: intervals_by(rows, sample, "period"))
+
+    return await cached_result("trends", start_date, end_date, category, period, approx, compute)
 
-    trend_data = defaultdict(lambda: {"saved": 0, "donated": 0, "wasted": 0})
 
-    for item in all_items:
-        qty_raw = item.get("quantity", 1)
+@router.get("/dashboard")
+async def get_dashboard(
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    approx: Optional[bool] = Query(None)
+):
+    """Summary, category breakdown and every trend period in one aggregation."""
+    async def compute():
+        match_criteria = rollup_match(start_date, end_date, category)
+        sample = await choose_sample(approx)
+        pipeline = source_stages(match_criteria, sample) + [
+            {"$facet": {period: [bucket_stage(period)] for period in PERIOD_FORMATS}},
+        ]
         try:
-            quantity = int(float(qty_raw))
-        except (TypeError, ValueError):
-            quantity = 1
+            facets = (await rollups.aggregate(pipeline).to_list(length=1))[0]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database aggregation failed: {e}")
 
-        # Use created_at_date from aggregation pipeline
-        created = item.get("created_at_date")
-        if not created:
-            continue
+        rows = {period: flatten_rows(facets[period], sample) for period in PERIOD_FORMATS}
+        result = {
+            "summary": fold_summary(rows["monthly"], recent_only=not start_date and not end_date),
+            "categories": fold_categories(rows["monthly"]),
+            "trends": {period: fold_trends(rows[period]) for period in PERIOD_FORMATS},
+        }
+        return with_approximation(result, sample, lambda: {
+            **summary_intervals(rows["monthly"], sample),
+            "trends": {period: intervals_by(rows[period], sample, "period") for period in PERIOD_FORMATS},
+        })
 
-        # Format based on period
-        if period == "weekly":
-            key = created.strftime("%Y-W%U")  # e.g. "2025-W45"
-        elif period == "yearly":
-            key = created.strftime("%Y")
-        else:  # monthly default
-            key = created.strftime("%Y-%m")
-
-        # Check if item is expired (wasted)
-        expiry = item.get("expiry_date")
-        is_wasted = False
-        
-        if expiry:
-            if isinstance(expiry, str):
-                try:
-                    expiry = parse(expiry)
-                except Exception:
-                    expiry = None
-            
-            if expiry and expiry < datetime.utcnow():
-                is_wasted = True
-                trend_data[key]["wasted"] += quantity
-
-        if not is_wasted:
-            if item.get("source") == "donation":
-                trend_data[key]["donated"] += quantity
-            else:
-                trend_data[key]["saved"] += quantity
+    return await cached_result("dashboard", start_date, end_date, category, None, approx, compute)
 
-    trend_list = [
-        {"period": k, "saved": v["saved"], "donated": v["donated"], "wasted": v["wasted"]}
-        for k, v in sorted(trend_data.items())
+
+# ----------------------------------------------------
+# Forecast
+# ----------------------------------------------------
+# (user_id, category) -> (version, forecast); the version changes when one of
+# the user's rollup rows is written (rollup_state watermark, see
+# analytics_rollups.version_id) or a new week starts, so entries only need the
+# LRU bound, not a TTL
+forecast_cache = TTLCache(maxsize=settings.FORECAST_CACHE_SIZE, ttl=365 * 24 * 3600)
+
+FORECAST_OUTCOMES = {"used": "saved", "donated": "donated", "wasted": "wasted"}
+
+
+def forecast_match(user_id: Optional[str], category: Optional[str], first_week: datetime, this_week: datetime) -> dict:
+    match_criteria = {"day": {"$gte": first_week, "$lt": this_week}}
+    if user_id:
+        match_criteria["user_id"] = user_id
+    if category:
+        match_criteria["category"] = category
+    return match_criteria
+
+
+async def compute_forecast(match_criteria: dict, first_week: datetime, this_week: datetime) -> dict:
+    try:
+        rows = await rollups.aggregate([
+            {"$match": match_criteria},
+            {"$group": {
+                "_id": {"category": "$category", "outcome": "$outcome", "day": "$day"},
+                "quantity": {"$sum": "$quantity"},
+            }},
+        ]).to_list(length=None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database aggregation failed: {e}")
+
+    if not rows:
+        return {"hasData": False, "forecast": []}
+
+    categories = sorted({row["_id"]["category"] for row in rows})
+    category_index = {cat: i for i, cat in enumerate(categories)}
+    outcome_index = {outcome: i for i, outcome in enumerate(OUTCOMES)}
+
+    series_index = np.array([
+        category_index[row["_id"]["category"]] * len(OUTCOMES)
+        + outcome_index[FORECAST_OUTCOMES[row["_id"]["outcome"]]]
+        for row in rows
+    ])
+    week_index = np.array([(row["_id"]["day"] - first_week).days // 7 for row in rows])
+    quantity = np.array([row["quantity"] for row in rows], dtype=float)
+
+    history = weekly_matrix(
+        series_index, week_index, quantity,
+        len(categories) * len(OUTCOMES), settings.FORECAST_HISTORY_WEEKS,
+    )
+    projected = holt_forecast(
+        history, settings.FORECAST_MAX_WEEKS, settings.FORECAST_ALPHA, settings.FORECAST_BETA
+    ).reshape(len(categories), len(OUTCOMES), settings.FORECAST_MAX_WEEKS).round(1)
+
+    week_starts = [
+        (this_week + timedelta(weeks=k)).strftime("%Y-%m-%d") for k in range(settings.FORECAST_MAX_WEEKS)
     ]
+    forecast = [
+        {
+            "category": cat,
+            "weeks": [
+                {"weekStart": week_starts[k], **{outcome: float(projected[c, o, k]) for o, outcome in enumerate(OUTCOMES)}}
+                for k in range(settings.FORECAST_MAX_WEEKS)
+            ],
+        }
+        for c, cat in enumerate(categories)
+    ]
+    return {"hasData": True, "forecast": forecast}
+
+
+@router.get("/forecast")
+async def get_forecast(
+    weeks: int = Query(4, ge=1, le=settings.FORECAST_MAX_WEEKS),
+    category: Optional[str] = Query(None),
+    user_id: Optional[str] = Query(None)
+):
+    """Project saved / donated / wasted quantities per category for the next `weeks` weeks."""
+    today = datetime.combine(datetime.utcnow().date(), time.min)
+    this_week = today - timedelta(days=today.weekday())  # weeks start on Monday
+    first_week = this_week - timedelta(weeks=settings.FORECAST_HISTORY_WEEKS)
+    match_criteria = forecast_match(user_id, category, first_week, this_week)
+
+    # read from the same member as the rollups so the version matches the data
+    ids = [version_id(user_id or None), REBUILD_VERSION]
+    watermarks = {
+        doc["_id"]: doc["updated_at"]
+        async for doc in analytics_db["rollup_state"].find({"_id": {"$in": ids}})
+    }
+    version = (this_week, *(watermarks.get(_id) for _id in ids))
+
+    key = (user_id or None, category or None)
+    cached = forecast_cache.get(key)
+    if cached and cached[0] == version:
+        result = cached[1]
+    else:
+        result = await compute_forecast(match_criteria, first_week, this_week)
+        forecast_cache.set(key, (version, result))
 
-    return {"hasData": True, "trend": trend_list}
\ No newline at end of file
+    return {
+        "hasData": result["hasData"],
+        "weeks": weeks,
+        "historyWeeks": settings.FORECAST_HISTORY_WEEKS,
+        "forecast": [
+            {"category": entry["category"], "weeks": entry["weeks"][:weeks]}
+            for entry in result["forecast"]
+        ],
+    }
@@ -1,14 +1,21 @@
-from email.mime.multipart import MIMEMultipart
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Body, Request
 from pydantic import BaseModel, EmailStr
 from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 from dotenv import load_dotenv
-import os, jwt, random, string, smtplib
-from email.mime.text import MIMEText
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, os, random, string
 from app.database import db  # ✅ MongoDB connection
+from app.cache import TTLCache
 from app.config import settings
+from app.listeners.user_events import record_user_event
+from app.listeners.email_outbox import enqueue_email
+from app.rate_limit import enforce_rate_limit
+from app.security import (
+    create_access_token, get_current_user, revoke_token,
+    issue_refresh_token, rotate_refresh_token, end_session,
+)
 
 load_dotenv()
 
@@ -17,10 +24,14 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 # ---------------------------
 # Config
 # ---------------------------
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SECRET_KEY = os.getenv("JWT_SECRET", "supersecret")
-EMAIL_SENDER = os.getenv("EMAIL_SENDER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+# bcrypt is CPU-bound and releases the GIL, so it runs on a small thread pool
+# instead of blocking the event loop; excess work is refused rather than queued forever
+password_pool = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_password_jobs = 0
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
 
 # ---------------------------
@@ -45,56 +56,118 @@ class SetPasswordRequest(BaseModel):
     email: EmailStr
     new_password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class Update2FARequest(BaseModel):
     email: EmailStr
     enable_2fa: bool
 
+class UpdateExpiryDigestRequest(BaseModel):
+    email: EmailStr
+    expiry_digest_email: bool
+
 # ---------------------------
 # Helpers
 # ---------------------------
-def hash_password(password: str):
+def _hash_password_sync(password: str):
     if len(password) > 72:
         password = password[:72]
     return pwd_context.hash(password)
 
-def verify_password(plain: str, hashed: str):
+def _verify_password_sync(plain: str, hashed: str):
     if len(plain) > 72:
         plain = plain[:72]
     return pwd_context.verify(plain, hashed)
 
-def send_email_html(to_email: str, subject: str, html_content: str):
-    """Send HTML email via Gmail SMTP (with debug logging)"""
-    msg = MIMEMultipart("alternative")
-    msg["Subject"] = subject
-    msg["From"] = EMAIL_SENDER
-    msg["To"] = to_email
+async def _run_password_job(fn, *args):
+    """Run a bcrypt call on the password pool, rejecting it when the pool is saturated."""
+    global _password_jobs
+    if _password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy. Please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+    _password_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(password_pool, fn, *args)
+    finally:
+        _password_jobs -= 1
 
-    html_part = MIMEText(html_content, "html")
-    msg.attach(html_part)
+async def hash_password(password: str):
+    return await _run_password_job(_hash_password_sync, password)
 
-    print("📧 Sending email to:", to_email)
-    print("🔑 Sender:", EMAIL_SENDER)
-    print("🔐 Password starts with:", EMAIL_PASSWORD[:4])
+async def verify_password(plain: str, hashed: str):
+    return await _run_password_job(_verify_password_sync, plain, hashed)
 
-    try:
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465) as server:
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-            server.send_message(msg)
-        print("✅ Email sent successfully to:", to_email)
-    except Exception as e:
-        print("❌ Email sending failed:", e)
+# ---------------------------
+# User Profile Cache
+# ---------------------------
+# Read-through cache of user documents without pwd_hash, keyed by email and by id.
+# Writes in this router invalidate both keys; the TTL bounds staleness across workers.
+PROFILE_PROJECTION = {"pwd_hash": 0}
+profile_cache = TTLCache(
+    maxsize=settings.PROFILE_CACHE_SIZE, ttl=settings.PROFILE_CACHE_TTL_SECONDS
+)
+
+def cache_user(user: dict):
+    profile_cache.set(("email", user["email"]), user)
+    profile_cache.set(("id", str(user["_id"])), user)
+
+def invalidate_user(user: dict):
+    profile_cache.pop(("email", user["email"]))
+    profile_cache.pop(("id", str(user["_id"])))
+
+async def get_cached_user(email: str | None = None, user_id: str | None = None):
+    """Return the projected user by email or id, hitting MongoDB only on a cache miss."""
+    key = ("email", email) if email else ("id", str(user_id))
+    user = profile_cache.get(key)
+    if user is None:
+        query = {"email": email} if email else {"_id": ObjectId(user_id)}
+        user = await db.household_users.find_one(query, projection=PROFILE_PROJECTION)
+        if user:
+            cache_user(user)
+    return user
+
+
+# ---------------------------
+# Indexes (run on startup)
+# ---------------------------
+async def ensure_auth_indexes():
+    # Expired codes disappear on their own; the grace period keeps a used
+    # enable_2fa code around long enough for set_password to find it
+    await db.verification_codes.create_index(
+        "expires_at",
+        expireAfterSeconds=settings.VERIFICATION_CODE_RETENTION_SECONDS,
+        name="verification_code_ttl",
+    )
+    # verify_2fa: one atomic lookup by user + code, unused and unexpired
+    await db.verification_codes.create_index(
+        [("user_id", 1), ("code", 1), ("is_used", 1), ("expires_at", 1)],
+        name="verification_code_lookup",
+    )
+    # set_password: latest used code for a purpose
+    await db.verification_codes.create_index(
+        [("user_id", 1), ("purpose", 1), ("is_used", 1), ("created_at", -1)],
+        name="verification_code_purpose",
+    )
 
 
 # ---------------------------
 # Register User
 # ---------------------------
 @router.post("/register")
-async def register_user(request: RegisterRequest):
+async def register_user(request: RegisterRequest, http_request: Request):
+    await enforce_rate_limit("register", http_request, request.email)
+
     existing = await db.household_users.find_one({"email": request.email})
     if existing:
         raise HTTPException(status_code=400, detail="Account already exists")
 
-    hashed = hash_password(request.password)
+    hashed = await hash_password(request.password)
     acct_status = "pending" if request.enable_2fa else "active"
 
     user = {
@@ -110,6 +183,7 @@ async def register_user(request: RegisterRequest):
 
     result = await db.household_users.insert_one(user)
     user_id = str(result.inserted_id)
+    await record_user_event({"type": "user_registered", "full_name": request.full_name})
 
     # ✅ Send verification email with link only if 2FA enabled
     if request.enable_2fa:
@@ -180,7 +254,7 @@ async def register_user(request: RegisterRequest):
         </body>
         </html>
         """
-        send_email_html(
+        await enqueue_email(
             request.email,
             "EcoEats - Verify Your Account",
             html_content
@@ -199,10 +273,11 @@ async def register_user(request: RegisterRequest):
 # ---------------------------
 @router.post("/enable-2fa/{user_id}")
 
-async def enable_2fa(user_id: str):
+async def enable_2fa(user_id: str, http_request: Request):
     
     """Generate and send a new 2FA code for an existing user"""
-    user = await db.household_users.find_one({"_id": ObjectId(user_id)})
+    await enforce_rate_limit("enable_2fa", http_request, user_id)
+    user = await get_cached_user(user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -251,7 +326,7 @@ async def enable_2fa(user_id: str):
     </html>
     """
 
-    send_email_html(
+    await enqueue_email(
         user["email"],
         "EcoEats - New Verification Code",
         html_content
@@ -267,7 +342,7 @@ async def get_user_by_email(email: EmailStr):
     
 
     """Get user ID by email - used for resending verification codes"""
-    user = await db.household_users.find_one({"email": email})
+    user = await get_cached_user(email=email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -286,8 +361,10 @@ async def get_user_by_email(email: EmailStr):
 #  Verify 2FA (Updated to mark code as used and set purpose)
 # ---------------------------
 @router.post("/verify-2fa")
-async def verify_2fa(request: Verify2FARequest):
-    user = await db.household_users.find_one({"email": request.email})
+async def verify_2fa(request: Verify2FARequest, http_request: Request):
+    await enforce_rate_limit("verify_2fa", http_request, request.email)
+
+    user = await get_cached_user(email=request.email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -296,29 +373,28 @@ async def verify_2fa(request: Verify2FARequest):
     if isinstance(user_id, str):
         user_id = ObjectId(user_id)
 
-    record = await db.verification_codes.find_one({
-        "user_id": user_id,  # ✅ use normalized ObjectId consistently
-        "code": request.code,
-        "is_used": False
-    })
+    # Check the code and mark it used in one atomic, indexed operation
+    now = datetime.now(timezone.utc)
+    record = await db.verification_codes.find_one_and_update(
+        {
+            "user_id": user_id,  # ✅ use normalized ObjectId consistently
+            "code": request.code,
+            "is_used": False,
+            "expires_at": {"$gt": now},
+        },
+        {"$set": {"is_used": True, "used_at": now}},
+    )
 
     if not record:
+        # failure path only: tell an expired code apart from a wrong one
+        expired = await db.verification_codes.find_one(
+            {"user_id": user_id, "code": request.code, "is_used": False},
+            projection={"_id": 1},
+        )
+        if expired:
+            raise HTTPException(status_code=400, detail="Verification code expired")
         raise HTTPException(status_code=400, detail="Invalid verification code")
 
-    # Check expiry
-    expires_at = record["expires_at"]
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-
-    if datetime.now(timezone.utc) > expires_at:
-        raise HTTPException(status_code=400, detail="Verification code expired")
-
-    # Mark as used
-    await db.verification_codes.update_one(
-        {"_id": record["_id"]},
-        {"$set": {"is_used": True}}
-    )
-
     purpose = record.get("purpose", "2fa")
 
     if purpose == "enable_2fa":
@@ -331,6 +407,7 @@ async def verify_2fa(request: Verify2FARequest):
         {"_id": user_id},
         {"$set": {"acct_status": "pending"}}
     )
+    invalidate_user(user)
     return {
         "message": "2FA verified successfully. Please set your password to activate your account.",
         "purpose": "register_2fa"
@@ -342,8 +419,10 @@ async def verify_2fa(request: Verify2FARequest):
 # ---------------------------
 
 @router.post("/login")
-async def login_user(request: LoginRequest):
-    
+async def login_user(request: LoginRequest, http_request: Request):
+    # 🚦 Step 0: Throttle before any database access or password hashing
+    await enforce_rate_limit("login", http_request, request.email)
+
     # 🔍 Step 1: Find the user by email
     user = await db.household_users.find_one({"email": request.email})
     if not user:
@@ -355,7 +434,7 @@ async def login_user(request: LoginRequest):
         user_id = ObjectId(user_id)
 
     # 🔑 Step 2: Check password
-    if not verify_password(request.password, user["pwd_hash"]):
+    if not await verify_password(request.password, user["pwd_hash"]):
         raise HTTPException(
             status_code=400, detail="Invalid email or password. Please try again."
         )
@@ -367,22 +446,22 @@ async def login_user(request: LoginRequest):
             detail="Your account is not activated. Please verify your email or contact support.",
         )
 
-    # 🕒 Step 4: Generate JWT access token (valid for 15 minutes)
-    payload = {
-        "sub": str(user["_id"]),
-        "exp": datetime.now(timezone.utc) + timedelta(minutes=15),
-    }
-    token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+    # 🕒 Step 4: Generate JWT access token (valid for ACCESS_TOKEN_MINUTES)
+    token = create_access_token(str(user["_id"]), user["email"])
+    refresh_token = await issue_refresh_token(str(user["_id"]), user["email"])
 
     # 🧾 Step 5: Update last login time
     await db.household_users.update_one(
         {"_id": user["_id"]},
         {"$set": {"last_login_at": datetime.now(timezone.utc)}},
     )
+    invalidate_user(user)
+    await record_user_event({"type": "user_login", "email": user["email"]})
 
     # ✅ Step 6: Return access token to frontend
     return {
         "access_token": token,
+        "refresh_token": refresh_token,
         "token_type": "bearer",
         "message": "Login successful!",
         "user": {
@@ -392,6 +471,34 @@ async def login_user(request: LoginRequest):
     }
 
 
+# ---------------------------
+#  Current User / Logout (bearer token)
+# ---------------------------
+@router.get("/me")
+async def get_me(current_user: dict = Depends(get_current_user)):
+    """Identity resolved from the bearer token (no database read)"""
+    return {"user_id": current_user["user_id"], "email": current_user["email"]}
+
+
+@router.post("/refresh")
+async def refresh_access_token(request: RefreshRequest):
+    """Mint a new access token from a refresh token (rotates it; no password check)"""
+    return await rotate_refresh_token(request.refresh_token)
+
+
+@router.post("/logout")
+async def logout_user(
+    current_user: dict = Depends(get_current_user),
+    refresh_token: str | None = Body(None, embed=True),
+):
+    """Revoke the presented access token until it expires and end its refresh session"""
+    if current_user.get("jti"):
+        await revoke_token(current_user["jti"], current_user["exp"])
+    if refresh_token:
+        await end_session(refresh_token)
+    return {"message": "Logged out successfully."}
+
+
 # ---------------------------
 #  Set Password (After Register)
 # ---------------------------
@@ -408,7 +515,7 @@ async def set_password(request: SetPasswordRequest):
     if isinstance(user_id, str):
         user_id = ObjectId(user_id)
 
-    hashed = hash_password(request.new_password)
+    hashed = await hash_password(request.new_password)
 
     # Look for a recently used verification code for enabling 2FA
     recent_verification = await db.verification_codes.find_one(
@@ -436,6 +543,7 @@ async def set_password(request: SetPasswordRequest):
             "updated_at": datetime.now(timezone.utc)
         }}
     )
+    invalidate_user(user)
 
     return {"message": message}
 
@@ -445,7 +553,7 @@ async def set_password(request: SetPasswordRequest):
 @router.get("/profile")
 async def get_user_profile(email: EmailStr):
     """Get user profile information by email"""
-    user = await db.household_users.find_one({"email": email})
+    user = await get_cached_user(email=email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -459,6 +567,7 @@ async def get_user_profile(email: EmailStr):
         "email": user["email"],
         "household_size": user.get("household_size"),
         "enable_2fa": user.get("enable_2fa", False),
+        "expiry_digest_email": user.get("expiry_digest_email", False),
         "acct_status": user.get("acct_status", "active"),
         "created_at": user["created_at"].isoformat() if user.get("created_at") else None,
         "last_login_at": user["last_login_at"].isoformat() if user.get("last_login_at") else None
@@ -467,32 +576,49 @@ async def get_user_profile(email: EmailStr):
 @router.post("/update-2fa-status")
 async def update_2fa_status(request: Update2FARequest):
     """Enable or disable 2FA for a user"""
-    user = await db.household_users.find_one({"email": request.email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    user_id = user["_id"]
-    if isinstance(user_id, str):
-        user_id = ObjectId(user_id)
-
-    await db.household_users.update_one(
-        {"_id": user["_id"]},
+    user = await db.household_users.find_one_and_update(
+        {"email": request.email},
         {"$set": {
             "enable_2fa": request.enable_2fa,
             "updated_at": datetime.now(timezone.utc)
-        }}
+        }},
+        projection={"_id": 1, "email": 1},
     )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user)
     
     return {
         "message": f"2FA {'enabled' if request.enable_2fa else 'disabled'} successfully",
         "enable_2fa": request.enable_2fa
     }
 
+@router.post("/update-expiry-digest")
+async def update_expiry_digest(request: UpdateExpiryDigestRequest):
+    """Opt in or out of the daily expiring-items digest email"""
+    user = await db.household_users.find_one_and_update(
+        {"email": request.email},
+        {"$set": {
+            "expiry_digest_email": request.expiry_digest_email,
+            "updated_at": datetime.now(timezone.utc)
+        }},
+        projection={"_id": 1, "email": 1},
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user(user)
+
+    return {
+        "message": f"Expiry digest {'enabled' if request.expiry_digest_email else 'disabled'} successfully",
+        "expiry_digest_email": request.expiry_digest_email
+    }
+
 @router.post("/profile/enable-2fa/{user_id}")
-async def enable_2fa(user_id: str):
+async def enable_2fa(user_id: str, http_request: Request):
     
     """Generate and send a new 2FA code for enabling 2FA from profile"""
-    user = await db.household_users.find_one({"_id": ObjectId(user_id)})
+    await enforce_rate_limit("enable_2fa", http_request, user_id)
+    user = await get_cached_user(user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -558,7 +684,7 @@ async def enable_2fa(user_id: str):
     </html>
     """
 
-    send_email_html(
+    await enqueue_email(
         user["email"],
         "EcoEats - Enable Two-Factor Authentication",
         html_content
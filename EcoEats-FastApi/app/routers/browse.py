@@ -2,7 +2,10 @@
 from fastapi import APIRouter, HTTPException, Query, Body
 from bson import ObjectId
 from datetime import datetime, timedelta
+from pymongo import ReturnDocument
 from app.database import db
+from app.listeners.inventory_ledger import already_donated, record_outcome
+from app.routers.analytics import as_utc, parse_quantity
 
 router = APIRouter(tags=["Browse"])
 
@@ -95,13 +98,18 @@ async def mark_item_used(item_id: str):
 
     qty = item.get("quantity", 1)
     if qty > 1:
-        await db.food_items.update_one(
+        before = await db.food_items.find_one_and_update(
             {"_id": ObjectId(item_id)},
-            {"$inc": {"quantity": -1}}
+            {"$inc": {"quantity": -1}},
+            return_document=ReturnDocument.BEFORE
         )
+        if before:
+            await record_outcome("consume", before, quantity=1)
         return {"status": "quantity decreased"}
     else:
-        await db.food_items.delete_one({"_id": ObjectId(item_id)})
+        deleted = await db.food_items.find_one_and_delete({"_id": ObjectId(item_id)})
+        if deleted:
+            await record_outcome("consume", deleted, quantity=1)
         return {"status": "item removed"}
 
 
@@ -155,22 +163,41 @@ async def remove_donation(item_id: str):
 # Mark item as donated
 @router.put("/item/{item_id}/mark-donated")
 async def mark_donated(item_id: str):
-    result = await db.food_items.update_one(
-        {"_id": ObjectId(item_id)},
-        {"$set": {"donated": True}}
+    now = datetime.utcnow()
+    before = await db.food_items.find_one_and_update(
+        {"_id": ObjectId(item_id), "donated": {"$ne": True}},
+        # donated_at / donated_quantity let unmark-donated reverse this exact event
+        {"$set": {"donated": True, "donated_at": now}},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.modified_count == 0:
+    if not before:
         raise HTTPException(status_code=404, detail="Item not found or already donated")
+    if not already_donated(before):
+        quantity = parse_quantity(before.get("quantity"))
+        await db.food_items.update_one(
+            {"_id": before["_id"]}, {"$set": {"donated_quantity": quantity}}
+        )
+        await record_outcome("donate", before, quantity=quantity, ts=now)
     return {"status": "marked as donated"}
 
 
 # ✅ Unmark donated (move back to donation listings)
 @router.put("/item/{item_id}/unmark-donated")
 async def unmark_donated(item_id: str):
-    result = await db.food_items.update_one(
-        {"_id": ObjectId(item_id)},
-        {"$set": {"donated": False}}
+    before = await db.food_items.find_one_and_update(
+        {"_id": ObjectId(item_id), "donated": {"$ne": False}},
+        {"$set": {"donated": False}, "$unset": {"donated_at": "", "donated_quantity": ""}},
+        return_document=ReturnDocument.BEFORE
     )
-    if result.modified_count == 0:
+    if not before:
         raise HTTPException(status_code=404, detail="Item not found or not donated")
+    # reverse the donate event written by mark-donated, dated like it so both
+    # land in the same daily rollup row and cancel out
+    if before.get("donated") is True and before.get("status") != "Donated":
+        quantity = before.get("donated_quantity", parse_quantity(before.get("quantity")))
+        await record_outcome(
+            "donate", before, quantity=-quantity,
+            # items donated before the ledger have no donated_at; the backfill dated them at created_at
+            ts=as_utc(before.get("donated_at")) or as_utc(before.get("created_at")),
+        )
     return {"status": "returned to donation listings"}
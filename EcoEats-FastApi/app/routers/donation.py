@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException, status, Body
 from app.database import db
+from app.listeners.inventory_ledger import already_donated, record_outcome, record_removal
 from datetime import datetime
 from bson import ObjectId
 from bson.errors import InvalidId
@@ -43,6 +44,8 @@ async def convert_to_donation(
             "pickupLocation": pickupLocation
         }}
     )
+    if not already_donated(item):
+        await record_outcome("donate", item)
 
     # 🔔 Notify donation created
     await create_notification(
@@ -78,6 +81,7 @@ async def delete_donation(item_id: str):
         raise HTTPException(status_code=404, detail="Donation not found")
 
     await collection.delete_one({"_id": obj_id})
+    await record_removal(item)
 
     # 🔔 Create a notification for the deleted donation
     await create_notification(
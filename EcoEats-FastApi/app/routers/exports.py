@@ -0,0 +1,119 @@
+# app/routers/exports.py
+import asyncio
+import os
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, status
+from pymongo.errors import DuplicateKeyError
+from app.database import db
+from app.config import settings
+from app.exports import export_food_items
+from app.security import get_current_user
+
+router = APIRouter(tags=["Exports"])
+export_jobs = db["export_jobs"]
+
+# keep references to running export tasks so they are not garbage collected
+_running_exports = set()
+
+EXPORT_ADMINS = {e.strip().lower() for e in settings.EXPORT_ADMIN_EMAILS.split(",") if e.strip()}
+
+
+async def ensure_export_indexes():
+    # at most one queued/running export across all workers
+    await export_jobs.create_index(
+        "active",
+        unique=True,
+        name="one_active_export",
+        partialFilterExpression={"active": True},
+    )
+
+
+def require_export_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Exports read every user's items, so only EXPORT_ADMIN_EMAILS may start one."""
+    if (current_user.get("email") or "").lower() not in EXPORT_ADMINS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Exports are restricted to admins")
+    return current_user
+
+
+async def release_stale_exports():
+    """A job whose worker died stops reporting progress; free its slot."""
+    cutoff = datetime.utcnow() - timedelta(minutes=settings.EXPORT_STALE_MINUTES)
+    await export_jobs.update_many(
+        {"active": True, "updated_at": {"$lt": cutoff}},
+        {"$set": {"status": "failed", "error": "export stopped reporting progress",
+                  "finished_at": datetime.utcnow()},
+         "$unset": {"active": ""}}
+    )
+
+
+async def run_export_job(job_id: ObjectId, out_dir: str):
+    async def on_progress(rows: int):
+        await export_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"rows": rows, "updated_at": datetime.utcnow()}}
+        )
+
+    try:
+        await export_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "running", "started_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+        )
+        result = await export_food_items(out_dir, settings.EXPORT_BATCH_ROWS, on_progress)
+        await export_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {**result, "status": "done", "finished_at": datetime.utcnow()},
+             "$unset": {"active": ""}}
+        )
+    except Exception as e:
+        print("Export job failed:", e)
+        await export_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()},
+             "$unset": {"active": ""}}
+        )
+
+
+@router.post("/food-items", status_code=status.HTTP_202_ACCEPTED)
+async def start_food_items_export(current_user: dict = Depends(require_export_admin)):
+    """Snapshot food_items into month-partitioned Parquet files in the background."""
+    await release_stale_exports()
+
+    job_id = ObjectId()
+    out_dir = os.path.join(settings.EXPORT_DIR, str(job_id))
+    try:
+        await export_jobs.insert_one({
+            "_id": job_id,
+            "status": "queued",
+            "active": True,
+            "path": out_dir,
+            "rows": 0,
+            "requested_by": current_user["user_id"],
+            "created_at": datetime.utcnow(),
+            "updated_at": datetime.utcnow(),
+        })
+    except DuplicateKeyError:
+        running = await export_jobs.find_one({"active": True}, projection={"_id": 1})
+        detail = f"Export {running['_id']} is already running" if running else "An export is already running"
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+    task = asyncio.create_task(run_export_job(job_id, out_dir))
+    _running_exports.add(task)
+    task.add_done_callback(_running_exports.discard)
+
+    return {"job_id": str(job_id), "status": "queued", "path": out_dir}
+
+
+@router.get("/jobs/{job_id}")
+async def get_export_job(job_id: str, current_user: dict = Depends(require_export_admin)):
+    try:
+        obj_id = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job ID")
+
+    job = await export_jobs.find_one({"_id": obj_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+
+    job["job_id"] = str(job.pop("_id"))
+    return job
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Request
 from bson import ObjectId
 from bson.errors import InvalidId
 from app.database import db
+from app.listeners.inventory_ledger import record_removal
 from datetime import datetime
 from pydantic import BaseModel
 import json
@@ -319,12 +320,12 @@ async def delete_inventory_item(item_id: str):
     except:
         raise HTTPException(400, "Invalid ID format")
 
-    deleted_item = await collection.find_one({"_id": obj_id})
-
-    result = await collection.delete_one({"_id": obj_id})
-    if result.deleted_count == 0:
+    deleted_item = await collection.find_one_and_delete({"_id": obj_id})
+    if not deleted_item:
         raise HTTPException(404, "Item not found")
 
+    await record_removal(deleted_item)
+
     if deleted_item:
         await create_notification(
             title="Item Deleted",
@@ -9,6 +9,7 @@ from app.utils import food_status_from_date
 from bson import ObjectId
 from datetime import timedelta
 from app.routers.mealplan_templates import normalize_week_start
+from app.listeners.meal_notifications import delete_meal_entries, upsert_meal_reminders
 
 
 router = APIRouter(prefix="/mealplan", tags=["Meal Planner"])
@@ -361,7 +362,7 @@ async def frontend_save_mealplan(plan: dict = Body(...)):
     )
 
     # 2️⃣ Now update individual meal entries
-    await db.meal_entries.delete_many({"user_id": user_id, "week_start": week_start})
+    await delete_meal_entries({"user_id": user_id, "week_start": week_start})
 
     meal_entries = []
     for day, slots in meals.items():
@@ -404,6 +405,11 @@ async def frontend_save_mealplan(plan: dict = Body(...)):
                 inserted_ids.append(r.inserted_id)
             inserted_count = len(inserted_ids)
 
+        # schedule reminders for the new entries (insert_many filled in their _id)
+        for idx, meal_entry_id in enumerate(inserted_ids):
+            meal_entries[idx]["_id"] = meal_entry_id
+        await upsert_meal_reminders(meal_entries)
+
         # 3️⃣ create "meal activity" notifications (one per entry), duplicate-safe
         # iterate inserted_ids and the corresponding meal_entries
         for idx, entry in enumerate(meal_entries):
@@ -541,7 +547,7 @@ async def frontend_copy_mealplan(body: dict = Body(...)):
         raise HTTPException(status_code=500, detail="Failed to copy meal plan. Please try again.")
 
     # ✅ Rebuild meal entries
-    await db.meal_entries.delete_many({"user_id": user_id, "week_start": to_week})
+    await delete_meal_entries({"user_id": user_id, "week_start": to_week})
 
     meal_entries = []
     for day, slots in meals.items():
@@ -568,6 +574,8 @@ async def frontend_copy_mealplan(body: dict = Body(...)):
         except Exception:
             raise HTTPException(status_code=500, detail="Database error while saving meal entries.")
 
+        await upsert_meal_reminders(meal_entries)
+
     return {
         "userId": user_id,
         "weekStart": to_week,
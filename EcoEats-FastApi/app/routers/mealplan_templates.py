@@ -109,8 +109,9 @@ async def apply_template(body: dict = Body(...)):
 
     # write meal_entries (copyLastWeek does this)
     from app.routers.mealplan import get_date_for_day
+    from app.listeners.meal_notifications import delete_meal_entries
 
-    await db.meal_entries.delete_many({"user_id": user_id, "week_start": week_start})
+    await delete_meal_entries({"user_id": user_id, "week_start": week_start})
     to_insert = []
 
     for day, slots in meals.items():
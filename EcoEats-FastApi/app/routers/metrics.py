@@ -0,0 +1,25 @@
+# app/routers/metrics.py
+from fastapi import APIRouter
+from app.listeners.email_outbox import email_queue_metrics
+from app.routers.auth import profile_cache
+from app.routers.analytics import analytics_cache
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/email")
+async def get_email_metrics():
+    """Email outbox depth by status, age of the oldest pending email and this worker's send counters."""
+    return await email_queue_metrics()
+
+
+@router.get("/profile-cache")
+async def get_profile_cache_metrics():
+    """Hit rate and size of this worker's user profile cache."""
+    return profile_cache.stats()
+
+
+@router.get("/analytics-cache")
+async def get_analytics_cache_metrics():
+    """Hit rate and size of this worker's analytics result cache."""
+    return analytics_cache.stats()
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from fastapi import APIRouter, HTTPException, status
 from app.database import db
+from app.config import settings
 from datetime import datetime
 from bson import ObjectId
 from pydantic import BaseModel, Field
@@ -7,6 +9,13 @@ from typing import Optional, List
 
 router = APIRouter(tags=["Notifications"])
 notifications = db["notifications"]
+notification_jobs = db["notification_jobs"]
+
+# Meal reminders stay "scheduled" until the reminder scheduler activates them at send_at
+VISIBLE_FILTER = {"status": {"$ne": "scheduled"}}
+
+# keep references to running job tasks so they are not garbage collected
+_running_jobs = set()
 
 # ----------------------
 # Pydantic Models
@@ -31,12 +40,15 @@ class NotificationModel(BaseModel):
         }
     }
 
+class MarkReadRequest(BaseModel):
+    ids: List[str]
+
 # ----------------------
 # Helper: CREATE SYSTEM NOTIFICATION
 # ----------------------
-async def create_system_notification(title: str, message: str = ""):
-    """Creates a system notification usable by login / signup / system events."""
-    doc = {
+def build_system_notification(title: str, message: str = "") -> dict:
+    """Builds a system notification document without writing it (for batched inserts)."""
+    return {
         "title": title,
         "message": message,
         "type": "system",
@@ -47,7 +59,10 @@ async def create_system_notification(title: str, message: str = ""):
         "action_label": None,
         "action_link": None,
     }
-    await notifications.insert_one(doc)
+
+async def create_system_notification(title: str, message: str = ""):
+    """Creates a system notification usable by login / signup / system events."""
+    await notifications.insert_one(build_system_notification(title, message))
 
 # ----------------------
 # Normalization Helper
@@ -101,12 +116,103 @@ def normalize_notification(doc: dict) -> dict:
 
     return doc
 
+# ----------------------
+# Background Jobs: chunked clear_all / mark_all_read
+# ----------------------
+async def run_notification_job(job_id: ObjectId, action: str):
+    """
+    Walk the notifications collection in _id-ranged chunks and delete / mark
+    each chunk, pausing between batches so a large collection never turns
+    into one long write burst.
+    """
+    base_filter = dict(VISIBLE_FILTER)
+    if action == "mark_all_read":
+        base_filter["is_read"] = False
+    batch_size = max(1, settings.NOTIFICATION_JOB_BATCH_SIZE)
+    pause = max(0, settings.NOTIFICATION_JOB_PAUSE_MS) / 1000
+
+    processed = 0
+    batches = 0
+    try:
+        # Snapshot the upper bound so notifications created after the request are left alone
+        newest = await notifications.find_one(base_filter, projection={"_id": 1}, sort=[("_id", -1)])
+        await notification_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "running", "started_at": datetime.utcnow()}}
+        )
+
+        last_id = None
+        while newest:
+            id_range = {"$lte": newest["_id"]}
+            if last_id is not None:
+                id_range["$gt"] = last_id
+
+            chunk = await notifications.find(
+                {**base_filter, "_id": id_range}, projection={"_id": 1}
+            ).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+            if not chunk:
+                break
+
+            chunk_range = {"$gte": chunk[0]["_id"], "$lte": chunk[-1]["_id"]}
+            if action == "clear_all":
+                result = await notifications.delete_many({**VISIBLE_FILTER, "_id": chunk_range})
+                processed += result.deleted_count
+            else:
+                result = await notifications.update_many(
+                    {**base_filter, "_id": chunk_range},
+                    {"$set": {"is_read": True}}
+                )
+                processed += result.modified_count
+
+            last_id = chunk[-1]["_id"]
+            batches += 1
+            await notification_jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"processed": processed, "batches": batches, "updated_at": datetime.utcnow()}}
+            )
+            await asyncio.sleep(pause)
+
+        await notification_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {
+                "status": "done",
+                "processed": processed,
+                "batches": batches,
+                "finished_at": datetime.utcnow(),
+            }}
+        )
+    except Exception as e:
+        print("Notification job failed:", e)
+        await notification_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}}
+        )
+
+
+async def start_notification_job(action: str) -> dict:
+    """Record a queued job, schedule it in the background and return its id at once."""
+    doc = {
+        "action": action,
+        "status": "queued",
+        "processed": 0,
+        "batches": 0,
+        "batch_size": settings.NOTIFICATION_JOB_BATCH_SIZE,
+        "created_at": datetime.utcnow(),
+    }
+    result = await notification_jobs.insert_one(doc)
+
+    task = asyncio.create_task(run_notification_job(result.inserted_id, action))
+    _running_jobs.add(task)
+    task.add_done_callback(_running_jobs.discard)
+
+    return {"job_id": str(result.inserted_id), "status": "queued"}
+
 # ----------------------
 # Routes
 # ----------------------
 @router.get("/", response_model=List[NotificationModel])
 async def get_notifications():
-    items = await notifications.find().sort("created_at", -1).to_list(length=None)
+    items = await notifications.find(VISIBLE_FILTER).sort("created_at", -1).to_list(length=None)
     normalized = [normalize_notification(item) for item in items]
     return normalized
 
@@ -122,17 +228,45 @@ async def mark_as_read(notif_id: str):
         raise HTTPException(status_code=404, detail="Notification not found")
     return {"modified_count": result.modified_count}
 
-@router.post("/mark_all_read")
-async def mark_all_read():
-    result = await notifications.update_many({"is_read": False}, {"$set": {"is_read": True}})
+@router.post("/mark_read")
+async def mark_many_as_read(request: MarkReadRequest):
+    try:
+        obj_ids = [ObjectId(notif_id) for notif_id in request.ids]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid notification ID")
+
+    if not obj_ids:
+        return {"modified_count": 0}
+
+    result = await notifications.update_many(
+        {"_id": {"$in": obj_ids}, "is_read": False},
+        {"$set": {"is_read": True}}
+    )
     return {"modified_count": result.modified_count}
 
-@router.delete("/clear_all")
+@router.post("/mark_all_read", status_code=status.HTTP_202_ACCEPTED)
+async def mark_all_read():
+    return await start_notification_job("mark_all_read")
+
+@router.delete("/clear_all", status_code=status.HTTP_202_ACCEPTED)
 async def clear_all_notifications():
-    result = await notifications.delete_many({})
-    return {"deleted_count": result.deleted_count}
+    return await start_notification_job("clear_all")
+
+@router.get("/jobs/{job_id}")
+async def get_notification_job(job_id: str):
+    try:
+        obj_id = ObjectId(job_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job ID")
+
+    job = await notification_jobs.find_one({"_id": obj_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job["job_id"] = str(job.pop("_id"))
+    return job
 
 @router.get("/unread_count")
 async def unread_count():
-    count = await notifications.count_documents({"is_read": False})
+    count = await notifications.count_documents({**VISIBLE_FILTER, "is_read": False})
     return {"unread_count": count}
\ No newline at end of file
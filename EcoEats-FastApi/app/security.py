@@ -0,0 +1,204 @@
+# app/security.py
+import asyncio
+import hashlib
+import secrets
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import jwt
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from app.cache import TTLCache
+from app.config import settings
+from app.database import db
+
+revoked_tokens = db["revoked_tokens"]
+sessions = db["sessions"]
+
+JWT_ALGORITHM = "HS256"
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# Decoded claims keyed by sha256(token); each entry lives until the token's exp
+_claims_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE)
+
+# jti -> exp (unix seconds); synced from the revoked_tokens TTL collection
+_revoked = {}
+_revoked_synced_at = None
+
+
+# ----------------------------------------------------
+# TOKENS
+# ----------------------------------------------------
+def create_access_token(user_id: str, email: str) -> str:
+    payload = {
+        "sub": user_id,
+        "email": email,
+        "jti": uuid.uuid4().hex,
+        "exp": datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_MINUTES),
+    }
+    return jwt.encode(payload, settings.JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+
+def decode_access_token(token: str) -> dict:
+    """Validate a bearer token, serving repeat validations from the claims cache."""
+    key = hashlib.sha256(token.encode()).digest()
+    claims = _claims_cache.get(key)
+
+    if claims is None:
+        try:
+            # exp sizes the cache entry and sub identifies the caller; a token
+            # without them is invalid (MissingRequiredClaimError -> 401)
+            claims = jwt.decode(
+                token, settings.JWT_SECRET, algorithms=[JWT_ALGORITHM],
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
+        except jwt.InvalidTokenError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        _claims_cache.set(key, claims, ttl=claims["exp"] - time.time())
+
+    if claims.get("jti") in _revoked:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+    return claims
+
+
+# ----------------------------------------------------
+# DEPENDENCY
+# ----------------------------------------------------
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer_scheme),
+) -> dict:
+    """Resolve the caller from the bearer token without touching the database."""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    claims = decode_access_token(credentials.credentials)
+    return {
+        "user_id": claims["sub"],
+        "email": claims.get("email"),
+        "jti": claims.get("jti"),
+        "exp": claims["exp"],
+    }
+
+
+# ----------------------------------------------------
+# INDEXES
+# ----------------------------------------------------
+async def ensure_security_indexes():
+    await revoked_tokens.create_index("expires_at", expireAfterSeconds=0, name="revoked_ttl")
+    await revoked_tokens.create_index("revoked_at", name="revoked_at")
+
+    await sessions.create_index("token_hash", unique=True, name="session_token_hash")
+    await sessions.create_index("expires_at", expireAfterSeconds=0, name="session_ttl")
+    await sessions.create_index("family_id", name="session_family")
+
+
+# ----------------------------------------------------
+# REFRESH TOKENS: rotating, stored hashed in sessions
+# ----------------------------------------------------
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def issue_refresh_token(user_id: str, email: str, family_id: str | None = None) -> str:
+    """Create a session and return its opaque refresh token (only the hash is stored)."""
+    token = secrets.token_urlsafe(32)
+    now = datetime.now(timezone.utc)
+    await sessions.insert_one({
+        "token_hash": _hash_refresh_token(token),
+        "user_id": user_id,
+        "email": email,
+        "family_id": family_id or uuid.uuid4().hex,
+        "created_at": now,
+        "expires_at": now + timedelta(days=settings.REFRESH_TOKEN_DAYS),
+    })
+    return token
+
+
+async def rotate_refresh_token(token: str) -> dict:
+    """
+    Trade a refresh token for a new access token and a new refresh token with one
+    indexed update. Presenting an already rotated token means it leaked, so the
+    whole session family is ended.
+    """
+    token_hash = _hash_refresh_token(token)
+    now = datetime.now(timezone.utc)
+
+    session = await sessions.find_one_and_update(
+        {"token_hash": token_hash, "rotated_at": {"$exists": False}, "expires_at": {"$gt": now}},
+        {"$set": {"rotated_at": now}},
+    )
+
+    if session is None:
+        reused = await sessions.find_one({"token_hash": token_hash, "rotated_at": {"$exists": True}})
+        if reused:
+            await sessions.delete_many({"family_id": reused["family_id"]})
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+    return {
+        "access_token": create_access_token(session["user_id"], session["email"]),
+        "refresh_token": await issue_refresh_token(
+            session["user_id"], session["email"], session["family_id"]
+        ),
+        "token_type": "bearer",
+    }
+
+
+async def end_session(token: str):
+    """Drop the session family a refresh token belongs to (logout)."""
+    session = await sessions.find_one({"token_hash": _hash_refresh_token(token)})
+    if session:
+        await sessions.delete_many({"family_id": session["family_id"]})
+
+
+# ----------------------------------------------------
+# REVOCATION
+# ----------------------------------------------------
+
+async def revoke_token(jti: str, exp: int):
+    """Revoke a token id until its natural expiry (the TTL index cleans it up after)."""
+    _revoked[jti] = exp
+    await revoked_tokens.update_one(
+        {"_id": jti},
+        {"$set": {
+            "expires_at": datetime.fromtimestamp(exp, tz=timezone.utc),
+            "revoked_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+
+
+async def sync_revocations():
+    """Pull revocations made by any worker since the last sync and prune expired ids."""
+    global _revoked_synced_at
+    query = {}
+    if _revoked_synced_at is not None:
+        # small overlap so writes racing the previous sync are not missed
+        query["revoked_at"] = {"$gte": _revoked_synced_at - timedelta(seconds=5)}
+
+    synced_at = datetime.utcnow()
+    async for doc in revoked_tokens.find(query, projection={"expires_at": 1}):
+        expires_at = doc["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        _revoked[doc["_id"]] = expires_at.timestamp()
+    _revoked_synced_at = synced_at
+
+    now = time.time()
+    for jti in [jti for jti, exp in _revoked.items() if exp <= now]:
+        del _revoked[jti]
+
+
+async def start_revocation_sync():
+    """Runs in every worker: each process keeps its own copy of the revocation set."""
+    while True:
+        try:
+            await sync_revocations()
+        except Exception as e:
+            print("Revocation sync failed:", e)
+        await asyncio.sleep(settings.REVOCATION_SYNC_SECONDS)
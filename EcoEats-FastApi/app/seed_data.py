@@ -1,10 +1,11 @@
 import asyncio
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
 from app.database import db
+from app.listeners.inventory_ledger import backfill_ledger
 
-# Helper: UTC timestamp
+# Helper: UTC timestamp (naive, like every other food_items writer)
 def utc_now():
-    return datetime.now(timezone.utc)
+    return datetime.utcnow()
 
 # Helper to build inventory item
 def make_item(
@@ -81,5 +82,14 @@ async def seed():
     result = await db.food_items.insert_many(sample_items)
     print(f"✅ Inserted {len(result.inserted_ids)} inventory items aligned with recipes")
 
+    # the old ledger describes items that no longer exist; start it over from the seed
+    # drop rather than delete_many: time-series deletes need MongoDB 7.0;
+    # backfill_ledger recreates the collection
+    await db.inventory_events.drop()
+    await db.daily_rollups.delete_many({})
+    await db.rollup_state.delete_many({})
+    events = await backfill_ledger(utc_now(), force=True)
+    print(f"📒 Backfilled {events} inventory event(s) and rebuilt daily_rollups")
+
 if __name__ == "__main__":
     asyncio.run(seed())
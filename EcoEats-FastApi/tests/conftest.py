@@ -0,0 +1,71 @@
+# tests/conftest.py
+"""
+Shared test setup. Settings are read at import time, so the required values
+get placeholders here before any app module is imported. Environment
+variables take precedence over app/.env, so only values already exported in
+the shell are kept.
+
+Run from EcoEats-FastApi/:
+    python -m pytest -q tests
+
+With REPLICA_SET_URI set (see docker-compose.replicaset.yml), app.database
+itself connects to that replica set, using a throwaway database, so
+tests/test_replica_reads.py exercises the real analytics_db handle.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+REPLICA_SET_URI = os.environ.get("REPLICA_SET_URI")
+if REPLICA_SET_URI:
+    os.environ["MONGO_URI"] = REPLICA_SET_URI
+    os.environ["DB_NAME"] = "ecoeats_rs_test"  # dropped by the replica-set tests
+
+os.environ.setdefault("MONGO_URI", "mongodb://127.0.0.1:27017")
+os.environ.setdefault("DB_NAME", "ecoeats_test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+os.environ.setdefault("EMAIL_SENDER", "noreply@ecoeats.test")
+os.environ.setdefault("EMAIL_PASSWORD", "unused")
+
+
+try:
+    from pymongo import monitoring
+except ImportError:  # the replica-set tests skip without the driver
+    monitoring = None
+
+
+if monitoring is not None:
+    class ServedBy(monitoring.CommandListener):
+        """
+        Command name -> (host, port) of the members that ran it. Registered
+        globally, before app.database creates its client, so it sees that
+        client's commands.
+        """
+
+        def __init__(self):
+            self.addresses = {}
+
+        def started(self, event):
+            self.addresses.setdefault(event.command_name, []).append(tuple(event.connection_id))
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            pass
+
+    _served_by = ServedBy()
+    if REPLICA_SET_URI:
+        monitoring.register(_served_by)
+
+
+@pytest.fixture
+def served_by():
+    """The global command listener, emptied for this test."""
+    if monitoring is None:
+        pytest.skip("pymongo is not installed")
+    _served_by.addresses.clear()
+    return _served_by
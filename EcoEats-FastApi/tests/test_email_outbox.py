@@ -0,0 +1,193 @@
+# tests/test_email_outbox.py
+"""
+Email outbox workers against a local aiosmtpd server: pooled sessions,
+reconnects after the server drops the connection, and retry/backoff until an
+email is marked failed. Outbox writes go to an in-memory stand-in, so no
+MongoDB is needed.
+"""
+import asyncio
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("aiosmtplib")
+pytest.importorskip("motor")
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+from app.config import settings  # noqa: E402
+from app.listeners import email_outbox  # noqa: E402
+from app.listeners.email_outbox import SMTPSession, build_email, deliver, retry_delay  # noqa: E402
+
+
+class RecordingHandler:
+    """Accepts every message and remembers which client connection sent it."""
+
+    def __init__(self, reject: bool = False):
+        self.reject = reject
+        self.messages = []  # (peer, recipients)
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.reject:
+            return "554 Transaction failed"
+        self.messages.append((session.peer, list(envelope.rcpt_tos)))
+        return "250 OK"
+
+
+class FakeOutbox:
+    """Records update_one calls made by deliver()."""
+
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(handler, port):
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller
+
+
+@pytest.fixture
+def smtp_port(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", port)
+    monkeypatch.setattr(settings, "SMTP_USE_TLS", False)
+    monkeypatch.setattr(settings, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(settings, "SMTP_LOGIN", False)
+    monkeypatch.setattr(settings, "SMTP_TIMEOUT_SECONDS", 5)
+    return port
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    fake = FakeOutbox()
+    monkeypatch.setattr(email_outbox, "email_outbox", fake)
+    return fake
+
+
+def queued(to: str, attempts: int = 1) -> dict:
+    doc = build_email(to, "Test", "<p>hello</p>")
+    doc["_id"] = to
+    doc["attempts"] = attempts
+    return doc
+
+
+# ----------------------------------------------------
+# Pooled session
+# ----------------------------------------------------
+def test_session_reuses_one_connection(smtp_port):
+    handler = RecordingHandler()
+    server = start_server(handler, smtp_port)
+
+    async def run():
+        session = SMTPSession()
+        try:
+            for n in range(3):
+                await session.send(email_outbox.to_mime(queued(f"user{n}@ecoeats.test")))
+        finally:
+            await session.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
+
+    assert len(handler.messages) == 3
+    assert len({peer for peer, _ in handler.messages}) == 1
+
+
+def test_session_reconnects_after_server_disconnect(smtp_port):
+    handler = RecordingHandler()
+    server = start_server(handler, smtp_port)
+
+    async def run():
+        nonlocal server
+        session = SMTPSession()
+        try:
+            await session.send(email_outbox.to_mime(queued("first@ecoeats.test")))
+            # restarting the server drops the pooled connection
+            server.stop()
+            server = start_server(handler, smtp_port)
+            await session.send(email_outbox.to_mime(queued("second@ecoeats.test")))
+        finally:
+            await session.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
+
+    recipients = [rcpt for _, rcpts in handler.messages for rcpt in rcpts]
+    assert recipients == ["first@ecoeats.test", "second@ecoeats.test"]
+    assert len({peer for peer, _ in handler.messages}) == 2
+
+
+# ----------------------------------------------------
+# Retry / backoff
+# ----------------------------------------------------
+def test_retry_delay_backs_off_and_caps(monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_RETRY_BASE_SECONDS", 10)
+    monkeypatch.setattr(settings, "EMAIL_RETRY_MAX_SECONDS", 100)
+
+    # jitter is +/-20%
+    assert timedelta(seconds=8) <= retry_delay(1) <= timedelta(seconds=12)
+    assert timedelta(seconds=32) <= retry_delay(3) <= timedelta(seconds=48)
+    assert retry_delay(10) <= timedelta(seconds=120)
+
+
+def test_rejected_email_is_retried_then_failed(smtp_port, outbox, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_MAX_ATTEMPTS", 3)
+    server = start_server(RecordingHandler(reject=True), smtp_port)
+
+    async def run():
+        session = SMTPSession()
+        try:
+            for attempts in range(1, 4):
+                await deliver(session, queued("someone@ecoeats.test", attempts=attempts))
+        finally:
+            await session.close()
+
+    started = datetime.utcnow()
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
+
+    updates = [update["$set"] for _, update in outbox.updates]
+    assert [u["status"] for u in updates] == ["pending", "pending", "failed"]
+    # each retry is scheduled later than the previous one
+    assert started < updates[0]["next_attempt_at"] < updates[1]["next_attempt_at"]
+    assert "554" in updates[2]["last_error"]
+
+
+def test_delivered_email_is_marked_sent(smtp_port, outbox):
+    handler = RecordingHandler()
+    server = start_server(handler, smtp_port)
+
+    async def run():
+        session = SMTPSession()
+        try:
+            await deliver(session, queued("ok@ecoeats.test"))
+        finally:
+            await session.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.stop()
+
+    (query, update), = outbox.updates
+    assert query == {"_id": "ok@ecoeats.test"}
+    assert update["$set"]["status"] == "sent"
+    assert update["$unset"] == {"html": ""}
+    assert len(handler.messages) == 1
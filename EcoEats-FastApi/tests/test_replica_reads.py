@@ -0,0 +1,122 @@
+# tests/test_replica_reads.py
+"""
+Secondary reads against a real three-node replica set
+(docker-compose.replicaset.yml). The module is skipped unless
+REPLICA_SET_URI points at a reachable replica set.
+
+conftest.py points MONGO_URI at that replica set before anything imports
+app.database, so these tests go through the app's own handles
+(analytics_db, rebuild_rollups, fetch_bucket_rows): a regression in
+database.py's read preference fails them. A global command listener records
+which member served each command.
+"""
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("motor")
+
+from pymongo import MongoClient  # noqa: E402
+from pymongo.errors import PyMongoError  # noqa: E402
+from pymongo.write_concern import WriteConcern  # noqa: E402
+
+REPLICA_SET_URI = os.environ.get("REPLICA_SET_URI")
+
+
+def replica_set_reachable() -> bool:
+    if not REPLICA_SET_URI:
+        return False
+    try:
+        with MongoClient(REPLICA_SET_URI, serverSelectionTimeoutMS=2000) as client:
+            hello = client.admin.command("hello")
+    except PyMongoError:
+        return False
+    return bool(hello.get("setName")) and len(hello.get("hosts", [])) >= 3
+
+
+pytestmark = pytest.mark.skipif(
+    not replica_set_reachable(),
+    reason="needs a 3-node replica set at REPLICA_SET_URI (docker-compose.replicaset.yml)",
+)
+
+from app.database import client, db, analytics_db  # noqa: E402
+from app.listeners.analytics_rollups import rebuild_rollups  # noqa: E402
+
+
+# app.database's Motor client binds to the first loop that uses it, so every
+# test runs on this one instead of a fresh asyncio.run loop
+loop = asyncio.new_event_loop()
+
+
+def run(body):
+    """Run `body(primary)` with the primary's (host, port), then drop the test database."""
+    async def wrapper():
+        try:
+            hello = await client.admin.command("hello")
+            host, port = hello["primary"].rsplit(":", 1)
+            await body((host, int(port)))
+        finally:
+            await client.drop_database(db.name)
+
+    loop.run_until_complete(wrapper())
+
+
+def replicated(collection):
+    """Write handle that waits for every member, so secondaries are not behind."""
+    return collection.with_options(write_concern=WriteConcern(w=3, wtimeout=10000))
+
+
+def test_analytics_db_reads_from_a_secondary(served_by):
+    async def body(primary):
+        await replicated(db.daily_rollups).insert_one({"category": "Dairy", "quantity": 3})
+        served_by.addresses.clear()
+        rows = await analytics_db.daily_rollups.find({"category": "Dairy"}).to_list(length=None)
+
+        assert [row["quantity"] for row in rows] == [3]
+        assert served_by.addresses["find"]
+        assert all(address != primary for address in served_by.addresses["find"])
+
+    run(body)
+
+
+def test_bucket_rows_are_aggregated_on_a_secondary(served_by):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("numpy")
+    from app.routers.analytics import fetch_bucket_rows
+
+    async def body(primary):
+        await replicated(db.daily_rollups).insert_many([
+            {"day": datetime(2025, 3, 3), "category": "Fruits", "source": "inventory", "outcome": "used", "quantity": 2},
+            {"day": datetime(2025, 3, 4), "category": "Fruits", "source": "inventory", "outcome": "wasted", "quantity": 1},
+        ])
+        served_by.addresses.clear()
+        rows = await fetch_bucket_rows({"category": "Fruits"}, "monthly")
+
+        assert sorted((row["outcome"], row["quantity"]) for row in rows) == [("used", 2), ("wasted", 1)]
+        assert all(address != primary for address in served_by.addresses["aggregate"])
+
+    run(body)
+
+
+def test_rebuild_scans_a_secondary_and_writes_through_the_primary(served_by):
+    async def body(primary):
+        ts = datetime(2025, 3, 14, 9, 30)
+        await replicated(db.inventory_events).insert_many([
+            {"ts": ts, "meta": {"user_id": "u1", "category": "Meat"}, "type": "consume", "quantity": 2},
+            {"ts": ts, "meta": {"user_id": "u1", "category": "Meat"}, "type": "expire", "quantity": 1},
+        ])
+        served_by.addresses.clear()
+        # default source is analytics_db; $out on a secondary read needs MongoDB 5.0+
+        await rebuild_rollups()
+
+        rows = await db.daily_rollups.find({}, projection={"_id": 0, "updated_at": 0}).sort(
+            "outcome", 1
+        ).to_list(length=None)
+        assert [(row["outcome"], row["quantity"], row["items"]) for row in rows] == [
+            ("used", 2, 1), ("wasted", 1, 1),
+        ]
+        assert all(address != primary for address in served_by.addresses["aggregate"])
+
+    run(body)
@@ -95,22 +95,17 @@ export default function FoodAnalytics() {
       if (endDate) params.append("end_date", endDate);
       if (selectedCategory) params.append("category", selectedCategory);
 
-      // Summary
-      const summaryRes = await fetch(
-        `${API_BASE_URL}/analytics/summary?${params}`
+      // Summary, categories and trends come back from one aggregation
+      const dashboardRes = await fetch(
+        `${API_BASE_URL}/analytics/dashboard?${params}`
       );
-      if (!summaryRes.ok) throw new Error("Failed to fetch summary");
-      const summaryData = await summaryRes.json();
-      setSummary(summaryData);
+      if (!dashboardRes.ok) throw new Error("Failed to fetch analytics");
+      const dashboard = await dashboardRes.json();
+      setSummary(dashboard.summary);
 
       // Categories
-      const categoryRes = await fetch(
-        `${API_BASE_URL}/analytics/categories?${params}`
-      );
-      if (!categoryRes.ok) throw new Error("Failed to fetch categories");
-      const categoryDataRaw = await categoryRes.json();
       const catData = Object.entries(
-        categoryDataRaw.categoriesBreakdown || {}
+        dashboard.categories.categoriesBreakdown || {}
       ).map(([name, data]: any) => ({
         name,
         total: data.total,
@@ -121,17 +116,7 @@ export default function FoodAnalytics() {
       setCategoryData(catData);
 
       // Trends
-      const trendsParams = new URLSearchParams();
-      trendsParams.append("period", period);
-      if (startDate) trendsParams.append("start_date", startDate);
-      if (endDate) trendsParams.append("end_date", endDate);
-      if (selectedCategory) trendsParams.append("category", selectedCategory);
-
-      const trendsRes = await fetch(
-        `${API_BASE_URL}/analytics/trends?${trendsParams}`
-      );
-      if (!trendsRes.ok) throw new Error("Failed to fetch trends");
-      const trendsData = await trendsRes.json();
+      const trendsData = dashboard.trends[period] || dashboard.trends.monthly;
 
       // Map backend field names (period/saved/donated/wasted) into frontend fields
       const trendFormatted = (trendsData.trend || []).map((t: any) => ({